@@ -1,40 +1,78 @@
 import os
+import click
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_login import LoginManager
 from dotenv import load_dotenv
 from flask_mail import Mail
 from config import Config
 from flask_mail import Mail
+from app.replicas import RoutingSession
 
 
 
 # Load environment variables from .env
 load_dotenv()
 
-db = SQLAlchemy()
-migrate = Migrate()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()
 login_manager.login_view = 'auth.login'
 mail = Mail()
 
 #----load_user----
-from app.models import User
 @login_manager.user_loader
 def load_user(user_id):
-    from app.models import User
-    return User.query.get(int(user_id))
+    # Served from a per-process cache of UserSnapshot objects; see app/auth/identity.py
+    from app.auth import identity
+    return identity.load_user(int(user_id))
 #-----------------
-def create_app():
+def create_app(config_class=Config):
     app = Flask(__name__)
-    app.config.from_object(Config)
+    app.config.from_object(config_class)
     # Init extensions
     db.init_app(app)
-    migrate.init_app(app, db)
+    if click.get_current_context(silent=True) is not None:
+        # Only the `flask db` commands need Alembic; web workers never import it.
+        from flask_migrate import Migrate
+        Migrate(app, db)
     login_manager.init_app(app)
     mail.init_app(app)
-    
+
+    from app.replicas import replicas
+    replicas.init_app(app)
+
+    from app import metrics
+    from app.email import dispatcher
+    from app.instrumentation import instrumentation
+    from app.pdf import pdf_cache, pdf_renderer
+    metrics.init_app(app)
+    instrumentation.init_app(app)
+    dispatcher.init_app(app)
+    pdf_cache.init_app(app)
+    pdf_renderer.init_app(app)
+
+    from app.dashboard.stats import stats_cache
+    stats_cache.init_app(app, ttl=app.config['DASHBOARD_STATS_TTL'])
+
+    from app.assets import assets
+    from app.compression import compression
+    assets.init_app(app)
+    compression.init_app(app)
+
+    from app.invoices.caching import fragment_cache
+    fragment_cache.init_app(app, ttl=app.config['INVOICE_FRAGMENT_CACHE_TTL'],
+                            maxsize=app.config['INVOICE_FRAGMENT_CACHE_SIZE'])
+
+    from app.auth import identity
+    from app.passwords import hasher
+    identity.init_app(app)
+    hasher.init_app(app)
+
+    from app.scheduler import scheduler
+    from app.status import mark_overdue
+    scheduler.init_app(app)
+    scheduler.add('mark_overdue', app.config['OVERDUE_CHECK_INTERVAL'], mark_overdue)
+
     # Blueprints
     from app.auth import auth as auth_blueprint
     app.register_blueprint(auth_blueprint)
@@ -48,6 +86,9 @@ def create_app():
     from app.dashboard import dashboard as dashboard_blueprint
     app.register_blueprint(dashboard_blueprint, url_prefix='/dashboard')
 
+    from app.api import api as api_blueprint
+    app.register_blueprint(api_blueprint, url_prefix='/api/v1')
+
 
     from datetime import datetime
     app.jinja_env.globals['current_time'] = datetime.today
@@ -0,0 +1,207 @@
+import hashlib
+from datetime import datetime
+from functools import wraps
+
+from flask import abort, current_app, jsonify, make_response, request
+from flask_login import current_user
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import is_resource_modified, quote_etag
+
+from . import api
+from .schema import ValidationError, invoice_json, parse_invoice
+from app import db, rollup, status
+from app.invoices.changes import invoices_changed, set_line_items
+from app.invoices.export import invoice_filters
+from app.models import Client, Invoice, LineItem
+from app.pagination import KeysetPage
+
+
+@api.errorhandler(HTTPException)
+def http_error(exc):
+    response = jsonify(error=exc.name, message=exc.description)
+    response.status_code = exc.code
+    return response
+
+
+def api_login_required(view):
+    # Flask-Login's login_required redirects to the HTML login page; an API
+    # client wants a plain 401.
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        if not current_user.is_authenticated:
+            response = jsonify(error='Unauthorized', message='Log in first.')
+            response.status_code = 401
+            return response
+        return view(*args, **kwargs)
+    return wrapped
+
+
+def _etag(invoices):
+    """Weak validator for a set of invoices from Invoice.version, which every write bumps.
+
+    updated_at alone can't tell apart two writes within its resolution.
+    """
+    parts = ','.join(f'{inv.id}:{inv.version}' for inv in invoices)
+    return hashlib.sha1(parts.encode()).hexdigest()
+
+
+def _not_modified(etag, last_modified):
+    """Checked before serializing anything, so a 304 costs no line item queries."""
+    return not is_resource_modified(request.environ, etag=etag, last_modified=last_modified)
+
+
+def _validated(response, etag, last_modified):
+    response.set_etag(etag, weak=True)
+    response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _load_line_items(invoices):
+    """Fill every invoice's line_items with one query."""
+    by_invoice = {inv.id: [] for inv in invoices}
+    if by_invoice:
+        for item in LineItem.query.filter(LineItem.invoice_id.in_(by_invoice)).order_by(LineItem.id):
+            by_invoice[item.invoice_id].append(item)
+    for inv in invoices:
+        set_committed_value(inv, 'line_items', by_invoice[inv.id])
+
+
+def _parse_timestamp(value, name):
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        abort(400, description=f'{name} must be an ISO 8601 timestamp.')
+
+
+@api.route('/invoices')
+@api_login_required
+def list_invoices():
+    criteria = invoice_filters(current_user.id, request.args)
+    if request.args.get('updated_since'):
+        criteria.append(Invoice.updated_at > _parse_timestamp(request.args['updated_since'], 'updated_since'))
+
+    per_page = request.args.get('per_page', current_app.config['INVOICES_PER_PAGE'], type=int)
+    per_page = max(1, min(per_page, current_app.config['MAX_PER_PAGE']))
+    # Oldest change first, so a sync job can resume from its last cursor.
+    page = KeysetPage(
+        Invoice.query.filter(*criteria),
+        [Invoice.updated_at, Invoice.id],
+        per_page,
+        after=request.args.get('after'),
+        descending=False,
+    )
+
+    etag = _etag(page.items)
+    last_modified = max((inv.updated_at for inv in page.items), default=None)
+    if _not_modified(etag, last_modified):
+        return _validated(make_response('', 304), etag, last_modified)
+
+    _load_line_items(page.items)
+    response = jsonify(
+        invoices=[invoice_json(inv) for inv in page.items],
+        next_cursor=page.next_cursor,
+    )
+    return _validated(response, etag, last_modified)
+
+
+@api.route('/invoices/<int:invoice_id>')
+@api_login_required
+def get_invoice(invoice_id):
+    invoice = Invoice.query.filter_by(id=invoice_id, user_id=current_user.id).first_or_404()
+    etag = _etag([invoice])
+    if _not_modified(etag, invoice.updated_at):
+        return _validated(make_response('', 304), etag, invoice.updated_at)
+    return _validated(jsonify(invoice_json(invoice)), etag, invoice.updated_at)
+
+
+def _unprocessable(errors):
+    response = jsonify(error='Unprocessable Entity', errors=errors)
+    response.status_code = 422
+    return response
+
+
+@api.route('/invoices/batch', methods=['POST'])
+@api_login_required
+def batch_invoices():
+    """Create (no ``id``) or update (with ``id``) many invoices in one transaction.
+
+    Nothing is written unless every entry is valid and no ``id`` appears
+    twice; a 422 lists the errors by the entry's index in the request.
+    """
+    payload = request.get_json(silent=True)
+    entries = payload.get('invoices') if isinstance(payload, dict) else None
+    if not isinstance(entries, list) or not entries:
+        return _unprocessable([{'index': None, 'errors': {'invoices': 'must be a non-empty list'}}])
+    if len(entries) > current_app.config['API_BATCH_MAX']:
+        return _unprocessable([{'index': None, 'errors': {
+            'invoices': f"at most {current_app.config['API_BATCH_MAX']} per request"}}])
+
+    errors, parsed, first_index = [], [], {}
+    for index, entry in enumerate(entries):
+        invoice_id = entry.get('id') if isinstance(entry, dict) else None
+        try:
+            if invoice_id is not None and (isinstance(invoice_id, bool) or not isinstance(invoice_id, int)):
+                raise ValidationError({'id': 'must be an integer'})
+            # Each update diffs line items and snapshots the rollup against the
+            # invoice as loaded; two updates of one invoice would both apply.
+            if invoice_id is not None and first_index.setdefault(invoice_id, index) != index:
+                raise ValidationError({'id': f'already updated by entry {first_index[invoice_id]}'})
+            parsed.append((index, invoice_id, parse_invoice(entry, partial=invoice_id is not None)))
+        except ValidationError as exc:
+            errors.append({'index': index, 'errors': exc.errors})
+
+    # Ownership checks: one IN query for invoices, one for clients.
+    update_ids = {invoice_id for _, invoice_id, _ in parsed if invoice_id is not None}
+    existing = {}
+    if update_ids:
+        existing = {inv.id: inv for inv in Invoice.query.filter(
+            Invoice.user_id == current_user.id, Invoice.id.in_(update_ids))
+            .options(selectinload(Invoice.line_items))}
+    client_ids = {values['client_id'] for _, _, values in parsed if 'client_id' in values}
+    owned_clients = set()
+    if client_ids:
+        owned_clients = set(db.session.scalars(db.select(Client.id).where(
+            Client.user_id == current_user.id, Client.id.in_(client_ids))))
+    for index, invoice_id, values in parsed:
+        entry_errors = {}
+        if invoice_id is not None and invoice_id not in existing:
+            entry_errors['id'] = 'no such invoice'
+        if 'client_id' in values and values['client_id'] not in owned_clients:
+            entry_errors['client_id'] = 'no such client'
+        if entry_errors:
+            errors.append({'index': index, 'errors': entry_errors})
+    if errors:
+        return _unprocessable(sorted(errors, key=lambda e: e['index']))
+
+    results, changes = [], []
+    for index, invoice_id, values in parsed:
+        items = values.pop('line_items', None)
+        if invoice_id is None:
+            invoice = Invoice(user_id=current_user.id, status=status.UNPAID)
+            before = None
+            db.session.add(invoice)
+        else:
+            invoice = existing[invoice_id]
+            before = rollup.snapshot(invoice)
+        for name, value in values.items():
+            setattr(invoice, name, value)
+        if items is not None:
+            set_line_items(invoice, items)
+        status.refresh(invoice)
+        changes.append((before, invoice))
+        results.append((index, invoice, invoice_id is None))
+
+    db.session.flush()
+    rollup.apply_invoice_changes((before, rollup.snapshot(inv)) for before, inv in changes)
+    db.session.commit()
+    invoices_changed(current_user.id, [inv.id for _, inv, created in results if not created])
+
+    response = jsonify(results=[
+        {'index': index, 'id': inv.id, 'created': created, 'etag': quote_etag(_etag([inv]), weak=True)}
+        for index, inv, created in results
+    ])
+    response.status_code = 201 if any(created for _, _, created in results) else 200
+    return response
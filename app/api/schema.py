@@ -0,0 +1,112 @@
+# app/api/schema.py
+#
+# JSON (de)serialization for the API. Validation errors are collected per
+# field so a batch response can point at exactly what was wrong.
+
+from datetime import date
+
+# Writable statuses; 'overdue' is assigned by the server from the due date.
+STATUSES = ('paid', 'unpaid')
+INVOICE_FIELDS = ('client_id', 'issue_date', 'due_date', 'status', 'line_items')
+
+
+class ValidationError(ValueError):
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+def line_item_json(item):
+    return {
+        'id': item.id,
+        'description': item.description,
+        'quantity': item.quantity,
+        'unit_price': item.unit_price,
+        'total': item.total,
+    }
+
+
+def invoice_json(invoice):
+    return {
+        'id': invoice.id,
+        'client_id': invoice.client_id,
+        'issue_date': _iso(invoice.issue_date),
+        'due_date': _iso(invoice.due_date),
+        'status': invoice.status,
+        'total_amount': invoice.total_amount,
+        'updated_at': _iso(invoice.updated_at),
+        'line_items': [line_item_json(item) for item in invoice.line_items],
+    }
+
+
+def _date(data, name, errors):
+    try:
+        return date.fromisoformat(data[name])
+    except (TypeError, ValueError):
+        errors[name] = 'must be a YYYY-MM-DD date'
+
+
+def _line_items(value, errors):
+    if not isinstance(value, list) or not value:
+        errors['line_items'] = 'must be a non-empty list'
+        return None
+    items = []
+    for n, raw in enumerate(value):
+        if not isinstance(raw, dict):
+            errors[f'line_items.{n}'] = 'must be an object'
+            continue
+        description = raw.get('description')
+        if not isinstance(description, str) or not description.strip() or len(description) > 200:
+            errors[f'line_items.{n}.description'] = 'must be a string of 1-200 characters'
+        quantity = raw.get('quantity')
+        if isinstance(quantity, bool) or not isinstance(quantity, int) or quantity < 1:
+            errors[f'line_items.{n}.quantity'] = 'must be an integer of at least 1'
+        unit_price = raw.get('unit_price')
+        if isinstance(unit_price, bool) or not isinstance(unit_price, (int, float)) or unit_price < 0:
+            errors[f'line_items.{n}.unit_price'] = 'must be a number of at least 0'
+        item_id = raw.get('id')
+        if item_id is not None and (isinstance(item_id, bool) or not isinstance(item_id, int)):
+            errors[f'line_items.{n}.id'] = 'must be an integer'
+        items.append({'id': item_id, 'description': description,
+                      'quantity': quantity, 'unit_price': unit_price})
+    return items
+
+
+def parse_invoice(data, partial=False):
+    """Validate one invoice payload; with ``partial`` only the fields present are checked.
+
+    Returns a dict holding just the fields that were supplied.
+    """
+    if not isinstance(data, dict):
+        raise ValidationError({'': 'must be an object'})
+    errors, values = {}, {}
+    unknown = set(data) - set(INVOICE_FIELDS) - {'id'}
+    for name in sorted(unknown):
+        errors[name] = 'unknown field'
+    for name in INVOICE_FIELDS:
+        if name not in data:
+            if not partial and name != 'status':
+                errors[name] = 'is required'
+            continue
+        if name == 'client_id':
+            client_id = data[name]
+            if isinstance(client_id, bool) or not isinstance(client_id, int):
+                errors[name] = 'must be an integer'
+            else:
+                values[name] = client_id
+        elif name in ('issue_date', 'due_date'):
+            values[name] = _date(data, name, errors)
+        elif name == 'status':
+            if data[name] not in STATUSES:
+                errors[name] = f"must be one of {', '.join(STATUSES)}"
+            else:
+                values[name] = data[name]
+        else:
+            values[name] = _line_items(data[name], errors)
+    if errors:
+        raise ValidationError(errors)
+    return values
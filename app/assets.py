@@ -0,0 +1,193 @@
+# app/assets.py
+#
+# Per-page CSS/JS bundles. `flask assets build` concatenates and minifies
+# each bundle into static/dist/<name>.<hash>.<ext> (gitignored), next to .gz
+# and .br copies and a manifest.json. Templates call asset_url('<page>.css'),
+# which points at the hashed file (served with immutable caching) once a
+# build exists, and at an on-the-fly concatenation of the sources before that.
+
+import gzip
+import hashlib
+import json
+import os
+import re
+
+import click
+from flask import abort, current_app, request, send_file, url_for
+from flask.cli import AppGroup
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # optional, listed in requirement.txt
+    brotli = None
+
+# Bundles made of more than one file, in load order. Every other css/*.css
+# and js/*.js file is a bundle on its own, named after the file.
+BUNDLES = {
+    'create_invoice.css': ['css/create_invoice.css', 'css/client_picker.css'],
+    'create_invoice.js': ['js/create_invoice.js', 'js/client_picker.js'],
+    'edit_invoice.css': ['css/edit_invoice.css', 'css/client_picker.css'],
+    'edit_invoice.js': ['js/client_picker.js'],
+}
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def bundles(static_folder):
+    found = {}
+    for kind in ('css', 'js'):
+        for name in sorted(os.listdir(os.path.join(static_folder, kind))):
+            if name.endswith(f'.{kind}'):
+                found[name] = [f'{kind}/{name}']
+    found.update(BUNDLES)
+    return found
+
+
+def minify_css(text):
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.S)
+    text = re.sub(r'\s+', ' ', text)
+    # Not before ':', where a space is a descendant combinator ("a :hover")
+    text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+    text = re.sub(r':\s+', ':', text)
+    return text.replace(';}', '}').strip()
+
+
+def minify_js(text):
+    """Drops indentation, blank lines and whole-line // comments; never touches template literals."""
+    lines, in_template = [], False
+    for line in text.splitlines():
+        if in_template:
+            lines.append(line)
+        else:
+            stripped = line.strip()
+            if stripped and not stripped.startswith('//'):
+                lines.append(stripped)
+        if len(re.findall(r'(?<!\\)`', line)) % 2:
+            in_template = not in_template
+    return '\n'.join(lines) + '\n'
+
+
+def _concat(static_folder, sources):
+    parts = []
+    for source in sources:
+        with open(os.path.join(static_folder, source), encoding='utf-8') as fh:
+            parts.append(fh.read())
+    # A lone ';' keeps one script's missing semicolon from swallowing the next
+    joiner = '\n;\n' if sources[0].endswith('.js') else '\n'
+    return joiner.join(parts)
+
+
+def build(static_folder, clean=False):
+    """Write every bundle and its compressed copies to static/dist; returns the manifest.
+
+    Files from earlier builds are kept unless ``clean``, so pages served by
+    workers still running the previous release keep working during a deploy.
+    """
+    dist = os.path.join(static_folder, DIST)
+    os.makedirs(dist, exist_ok=True)
+    manifest = {}
+    for name, sources in bundles(static_folder).items():
+        text = _concat(static_folder, sources)
+        stem, ext = os.path.splitext(name)
+        data = (minify_css(text) if ext == '.css' else minify_js(text)).encode('utf-8')
+        filename = f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+        path = os.path.join(dist, filename)
+        with open(path, 'wb') as fh:
+            fh.write(data)
+        with open(path + '.gz', 'wb') as fh:
+            fh.write(gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(path + '.br', 'wb') as fh:
+                fh.write(brotli.compress(data, quality=11))
+        manifest[name] = filename
+
+    if clean:
+        keep = set(manifest.values())
+        for entry in os.listdir(dist):
+            base = entry[:-3] if entry.endswith(('.gz', '.br')) else entry
+            if entry != MANIFEST and base not in keep:
+                os.remove(os.path.join(dist, entry))
+    with open(os.path.join(dist, MANIFEST), 'w') as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+    return manifest
+
+
+class Assets:
+    def __init__(self):
+        self.manifest = {}
+        self.version = ''
+
+    def init_app(self, app):
+        self.static_folder = app.static_folder
+        self.load_manifest()
+        app.extensions['assets'] = self
+        app.add_url_rule('/assets/<path:filename>', 'assets', self.serve)
+        app.jinja_env.globals['asset_url'] = self.url
+        app.cli.add_command(assets_cli)
+
+    def load_manifest(self):
+        try:
+            with open(os.path.join(self.static_folder, DIST, MANIFEST)) as fh:
+                self.manifest = json.load(fh)
+        except FileNotFoundError:
+            self.manifest = {}
+        # Changes whenever any bundle does; part of HTTP validators for cached pages
+        self.version = hashlib.sha1(json.dumps(self.manifest, sort_keys=True).encode()).hexdigest()[:12]
+
+    def url(self, name):
+        return url_for('assets', filename=self.manifest.get(name, name))
+
+    def serve(self, filename):
+        if filename in self.manifest.values():
+            return self._send_built(filename)
+        if filename in self.manifest:
+            # A page rendered before the build asking for the unhashed name
+            return self._send_built(self.manifest[filename], immutable=False)
+        sources = bundles(self.static_folder).get(filename)
+        if sources is None:
+            abort(404)
+        response = current_app.response_class(_concat(self.static_folder, sources),
+                                              mimetype='text/css' if filename.endswith('.css') else 'text/javascript')
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    def _send_built(self, filename, immutable=True):
+        path = safe_join(os.path.join(self.static_folder, DIST), filename)
+        if path is None or not os.path.exists(path):
+            abort(404)
+        encoding = None
+        for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if candidate in request.accept_encodings and os.path.exists(path + suffix):
+                encoding = candidate
+                break
+        mimetype = 'text/css' if filename.endswith('.css') else 'text/javascript'
+        response = send_file(path + ('.br' if encoding == 'br' else '.gz' if encoding else ''),
+                             mimetype=mimetype, conditional=True, etag=True, max_age=None)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = IMMUTABLE if immutable else 'no-cache'
+        return response
+
+
+assets = Assets()
+
+assets_cli = AppGroup('assets', help='Build the static asset bundles.')
+
+
+@assets_cli.command('build')
+@click.option('--clean', is_flag=True, help='Delete files left by earlier builds.')
+def build_command(clean):
+    """Bundle, minify, hash and precompress every page's CSS and JS."""
+    manifest = build(current_app.static_folder, clean=clean)
+    assets.load_manifest()
+    sizes = []
+    for name, filename in sorted(manifest.items()):
+        path = os.path.join(current_app.static_folder, DIST, filename)
+        sizes.append(f'{filename}: {os.path.getsize(path)} bytes'
+                     + (f', {os.path.getsize(path + ".br")} brotli' if os.path.exists(path + '.br') else ''))
+    click.echo('\n'.join(sizes))
+    click.echo(f'{len(manifest)} bundle(s) written to {os.path.join(current_app.static_folder, DIST)}')
@@ -4,12 +4,13 @@ from flask_login import login_user, logout_user, login_required, current_user
 from . import auth
 from .forms import RegisterForm, LoginForm, VerificationForm, ForgotPasswordForm, ResetPasswordForm  
 from app.models import User
+from app.auth.identity import invalidate_user
 from app import db
 from sqlalchemy.exc import IntegrityError
 from app.email import send_email
 import os , secrets
 from datetime import datetime, timedelta
-from werkzeug.security import generate_password_hash
+from app.passwords import hasher
 
 
 @auth.route('/')
@@ -33,7 +34,8 @@ def register():
 
         # Generate 6-digit code
         code = str(random.randint(100000, 999999))
-        session['reg_data'] = {'name': name, 'email': email, 'password': password}
+        # Hash now so the plain password never sits in the session cookie.
+        session['reg_data'] = {'name': name, 'email': email, 'password_hash': hasher.hash(password)}
         session['verification_code'] = code
 
         # Send the code to email
@@ -63,10 +65,14 @@ def verify_email():
 
         # Create user
         user = User(name=reg_data['name'], email=reg_data['email'])
-        user.set_password(reg_data['password'])
+        if 'password_hash' in reg_data:
+            user.password_hash = reg_data['password_hash']
+        else:  # registration started before hashes were kept in the session
+            user.set_password(reg_data['password'])
         try:
             db.session.add(user)
             db.session.commit()
+            invalidate_user(user.id)
             session.pop('verification_code')
             session.pop('reg_data')
             flash('Registration successful. Please login.', 'success')
@@ -141,10 +147,11 @@ def reset_password(token):
 
     form = ResetPasswordForm()
     if form.validate_on_submit():
-        user.password = generate_password_hash(form.password.data)
+        user.set_password(form.password.data)
         user.reset_token = None
         user.reset_token_expires = None
         db.session.commit()
+        invalidate_user(user.id)
         flash('Your password has been reset. Please log in.', 'success')
         return redirect(url_for('auth.login'))
 
@@ -156,6 +163,10 @@ def login():
     if form.validate_on_submit():
         user = User.query.filter_by(email=form.email.data).first()
         if user and user.check_password(form.password.data):
+            if db.session.is_modified(user):  # hash upgraded to the current parameters
+                db.session.commit()
+            # Start every session from fresh data, not a snapshot cached before it.
+            invalidate_user(user.id)
             login_user(user)
             flash('Logged in successfully.', 'success')
             return redirect(url_for('dashboard.index'))
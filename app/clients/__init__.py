@@ -2,4 +2,4 @@ from flask import Blueprint
 
 clients = Blueprint('clients', __name__)
 
-from . import routes  # Import routes after defining blueprint
+from . import routes, commands  # Import routes after defining blueprint
@@ -0,0 +1,33 @@
+import click
+
+from app import rollup
+from app.importer import import_clients
+from . import clients
+from .search import rebuild_index
+
+
+@clients.cli.command('import')
+@click.argument('csv_file', type=click.File('rb'))
+@click.option('--user-id', type=int, required=True, help='Owner of the imported clients.')
+@click.option('--batch-size', type=int, default=1000, show_default=True)
+def import_command(csv_file, user_id, batch_size):
+    """Bulk import clients from a CSV file."""
+    report = import_clients(csv_file, user_id, batch_size=batch_size)
+    for line, message in report.errors:
+        click.echo(f'line {line}: {message}', err=True)
+    click.echo(f'{report.rows} row(s) read, {report.created} client(s) created, {report.failed} rejected.')
+
+
+@clients.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Create the client search index if missing and repopulate it."""
+    dialect = rebuild_index()
+    click.echo(f'Client search index rebuilt ({dialect}).')
+
+
+@clients.cli.command('reconcile-balances')
+@click.option('--user-id', type=int, default=None, help='Only this user\'s clients (default: everyone).')
+def reconcile_balances_command(user_id):
+    """Recompute client balances, invoice counts and last invoice dates from invoices."""
+    fixed = rollup.reconcile_clients(user_id=user_id)
+    click.echo(f'{fixed} client(s) corrected.')
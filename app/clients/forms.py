@@ -1,4 +1,5 @@
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileRequired, FileAllowed
 from wtforms import StringField, TextAreaField, SubmitField
 from wtforms.validators import DataRequired, Optional, Email
 
@@ -9,3 +10,8 @@ class ClientForm(FlaskForm):
     company = StringField('Company', validators=[Optional()])
     notes = TextAreaField('Notes', validators=[Optional()])
     submit_btn = SubmitField('Add Client')
+
+
+class CSVImportForm(FlaskForm):
+    file = FileField('CSV file', validators=[FileRequired(), FileAllowed(['csv'], 'CSV files only')])
+    submit = SubmitField('Import')
@@ -1,9 +1,15 @@
-from flask import render_template, redirect, url_for, flash, request
+from flask import render_template, redirect, url_for, flash, request, jsonify, current_app
 from flask_login import login_required, current_user
 from . import clients
-from .forms import ClientForm
+from .forms import ClientForm, CSVImportForm
 from app import db
 from app.models import Client
+from app.importer import import_clients, CLIENT_COLUMNS
+from app.pagination import KeysetPage
+from app.rendering import render_list
+from .search import client_query
+from app.dashboard.stats import invalidate_user_stats
+from app.invoices.changes import client_details_changed
 
 @clients.route('/add', methods=['GET', 'POST'])
 @login_required
@@ -20,15 +26,71 @@ def add_client():
         )
         db.session.add(client)
         db.session.commit()
+        invalidate_user_stats(current_user.id)
         flash('Client added successfully!', 'success')
         return redirect(url_for('clients.list_clients'))
     return render_template('add_client.html', form=form)
 
+@clients.route('/import', methods=['GET', 'POST'])
+@login_required
+def import_clients_csv():
+    form = CSVImportForm()
+    report = None
+    if form.validate_on_submit():
+        report = import_clients(form.file.data.stream, current_user.id)
+        category = 'warning' if report.failed else 'success'
+        flash(f'Imported {report.created} client(s), {report.failed} row(s) rejected.', category)
+    return render_template('import.html', form=form, report=report, title='Import Clients',
+                           columns=CLIENT_COLUMNS, back_url=url_for('clients.list_clients'))
+
+# ?sort= -> keyset columns and direction; each has a matching (user_id, ..., id) index
+CLIENT_SORTS = {
+    'name': ([Client.name, Client.id], False),
+    'balance': ([Client.outstanding_balance, Client.id], True),
+    'invoices': ([Client.invoice_count, Client.id], True),
+}
+
 @clients.route('/list')
 @login_required
 def list_clients():
-    all_clients = Client.query.filter_by(user_id=current_user.id).all()
-    return render_template('client_list.html', clients=all_clients)
+    q = request.args.get('q', '').strip()
+    sort = request.args.get('sort', 'name')
+    if sort not in CLIENT_SORTS:
+        sort = 'name'
+    columns, descending = CLIENT_SORTS[sort]
+    owing = request.args.get('owing') == '1'
+
+    query = client_query(current_user.id, q)
+    if owing:
+        query = query.filter(Client.outstanding_balance > 0)
+    page = KeysetPage(
+        query,
+        columns,
+        current_app.config['CLIENTS_PER_PAGE'],
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        descending=descending,
+        lazy=True,
+    )
+    return render_list('client_list.html', clients=page, page=page, q=q, sort=sort, owing=owing)
+
+@clients.route('/search.json')
+@login_required
+def search_clients():
+    """Type-ahead: clients matching ?q= by name, company or email, alphabetically."""
+    limit = request.args.get('limit', 10, type=int)
+    limit = max(1, min(limit, current_app.config['MAX_PER_PAGE']))
+    page = KeysetPage(
+        client_query(current_user.id, request.args.get('q')),
+        [Client.name, Client.id],
+        limit,
+        after=request.args.get('after'),
+        descending=False,
+    )
+    return jsonify(
+        results=[{'id': c.id, 'name': c.name, 'company': c.company, 'email': c.email} for c in page.items],
+        next_cursor=page.next_cursor,
+    )
 
 @clients.route('/edit/<int:client_id>', methods=['GET', 'POST'])
 @login_required
@@ -36,11 +98,14 @@ def edit_client(client_id):
     client = Client.query.filter_by(id=client_id, user_id=current_user.id).first_or_404()
     form = ClientForm(obj=client)
     if form.validate_on_submit():
+        shown_on_invoices = (client.name, client.company)
         client.name = form.name.data
         client.email = form.email.data
         client.phone = form.phone.data
         client.company = form.company.data
         client.notes = form.notes.data
+        if (client.name, client.company) != shown_on_invoices:
+            client_details_changed(client.id)
         db.session.commit()
         flash('Client updated successfully!', 'success')
         return redirect(url_for('clients.list_clients'))
@@ -53,5 +118,6 @@ def delete_client(client_id):
     client = Client.query.filter_by(id=client_id, user_id=current_user.id).first_or_404()
     db.session.delete(client)
     db.session.commit()
+    invalidate_user_stats(current_user.id)
     flash('Client deleted.', 'info')
     return redirect(url_for('clients.list_clients'))
@@ -0,0 +1,88 @@
+# app/clients/search.py
+#
+# Substring search over client name, company and email. Postgres answers it
+# from pg_trgm GIN indexes, SQLite from an FTS5 trigram table kept in sync by
+# triggers. Neither is declared on the model: both are created by migration
+# e1ed8f85db66 and, for databases built with create_all(), by the
+# after_create hook below. migrations/env.py keeps autogenerate away from them.
+
+from sqlalchemy import DDL, column, event, literal_column, or_, select, table, text
+
+from app import db
+from app.models import Client
+
+SEARCH_COLUMNS = ('name', 'company', 'email')
+# Trigram indexes can't help with shorter queries.
+MIN_INDEXED_LENGTH = 3
+
+POSTGRES_DDL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    *(f'CREATE INDEX IF NOT EXISTS ix_client_trgm_{name} ON client USING gin ({name} gin_trgm_ops)'
+      for name in SEARCH_COLUMNS),
+]
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS client_fts USING fts5("
+    "name, company, email, content='client', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS client_fts_ai AFTER INSERT ON client BEGIN "
+    "INSERT INTO client_fts(rowid, name, company, email) VALUES (new.id, new.name, new.company, new.email); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS client_fts_ad AFTER DELETE ON client BEGIN "
+    "INSERT INTO client_fts(client_fts, rowid, name, company, email) "
+    "VALUES ('delete', old.id, old.name, old.company, old.email); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS client_fts_au AFTER UPDATE OF name, company, email ON client BEGIN "
+    "INSERT INTO client_fts(client_fts, rowid, name, company, email) "
+    "VALUES ('delete', old.id, old.name, old.company, old.email); "
+    "INSERT INTO client_fts(rowid, name, company, email) VALUES (new.id, new.name, new.company, new.email); "
+    "END",
+]
+
+for _statement in POSTGRES_DDL:
+    event.listen(Client.__table__, 'after_create', DDL(_statement).execute_if(dialect='postgresql'))
+for _statement in SQLITE_DDL:
+    event.listen(Client.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+
+_client_fts = table('client_fts', column('rowid'))
+
+
+def rebuild_index():
+    """(Re)create the search index for the current database and repopulate it.
+
+    SQLite drops triggers when a batch migration recreates the client table;
+    run this (``flask clients rebuild-search-index``) if that ever happens.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for statement in POSTGRES_DDL:
+            db.session.execute(text(statement))
+    elif dialect == 'sqlite':
+        for statement in SQLITE_DDL:
+            db.session.execute(text(statement))
+        db.session.execute(text("INSERT INTO client_fts(client_fts) VALUES ('rebuild')"))
+    db.session.commit()
+    return dialect
+
+
+def _like_pattern(q):
+    escaped = q.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def search_criterion(q):
+    """SQL criterion matching clients whose name, company or email contains ``q``."""
+    if db.session.get_bind().dialect.name == 'sqlite' and len(q) >= MIN_INDEXED_LENGTH:
+        phrase = '"' + q.replace('"', '""') + '"'
+        matches = select(_client_fts.c.rowid).where(literal_column('client_fts').op('MATCH')(phrase))
+        return Client.id.in_(matches)
+    # On Postgres each ILIKE is answered by its trigram index and OR-ed with a bitmap scan.
+    pattern = _like_pattern(q)
+    return or_(*(getattr(Client, name).ilike(pattern, escape='\\') for name in SEARCH_COLUMNS))
+
+
+def client_query(user_id, q=None):
+    query = Client.query.filter(Client.user_id == user_id)
+    q = (q or '').strip()
+    if q:
+        query = query.filter(search_criterion(q))
+    return query
@@ -0,0 +1,140 @@
+# app/compression.py
+#
+# Compresses text responses on the fly with Brotli or gzip, whichever the
+# client prefers (Brotli wins a tie). Streamed bodies are compressed chunk by
+# chunk and flushed after each one, so streaming still sends bytes early.
+# Responses that already carry a Content-Encoding (the precompressed
+# /assets files), PDFs and other binary types pass through untouched.
+
+import threading
+import zlib
+
+from flask import request
+
+from app import metrics
+
+try:
+    import brotli
+except ImportError:  # optional, listed in requirement.txt
+    brotli = None
+
+COMPRESSIBLE = {
+    'text/html', 'text/css', 'text/javascript', 'text/plain', 'text/csv',
+    'application/json', 'application/javascript', 'application/x-ndjson', 'image/svg+xml',
+}
+
+
+class _Gzip:
+    def __init__(self, level):
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def chunk(self, data):
+        return self._z.compress(data) + self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._z.flush()
+
+
+class _Brotli:
+    def __init__(self, quality):
+        self._b = brotli.Compressor(quality=quality)
+
+    def chunk(self, data):
+        return self._b.process(data) + self._b.flush()
+
+    def finish(self):
+        return self._b.finish()
+
+
+class Compression:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.responses = {'br': 0, 'gzip': 0}
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def init_app(self, app):
+        self.min_size = app.config['COMPRESS_MIN_SIZE']
+        self.gzip_level = app.config['COMPRESS_GZIP_LEVEL']
+        self.brotli_quality = app.config['COMPRESS_BROTLI_QUALITY']
+        app.extensions['compression'] = self
+        if app.config['COMPRESS_ENABLED']:
+            app.after_request(self.compress)
+        metrics.register('compression', self.stats)
+
+    def _encoding(self, response):
+        if (response.status_code < 200 or response.status_code in (204, 206, 304)
+                or request.method == 'HEAD'
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE
+                or response.direct_passthrough):
+            return None
+        offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+        return request.accept_encodings.best_match(offered)
+
+    def _compressor(self, encoding):
+        return _Brotli(self.brotli_quality) if encoding == 'br' else _Gzip(self.gzip_level)
+
+    def compress(self, response):
+        # Whatever we decide, caches must key the body on Accept-Encoding.
+        if response.mimetype in COMPRESSIBLE:
+            response.vary.add('Accept-Encoding')
+        encoding = self._encoding(response)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = self._stream(response.response, self._compressor(encoding))
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            compressor = self._compressor(encoding)
+            compressed = compressor.chunk(data) + compressor.finish()
+            response.set_data(compressed)
+            self._count(encoding, len(data), len(compressed))
+
+        response.headers['Content-Encoding'] = encoding
+        # The bytes differ per encoding, so a strong validator would be wrong.
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    def _stream(self, chunks, compressor):
+        size_in = size_out = 0
+        try:
+            for data in chunks:
+                if isinstance(data, str):
+                    data = data.encode('utf-8')
+                if data:
+                    out = compressor.chunk(data)
+                    size_in += len(data)
+                    size_out += len(out)
+                    yield out
+            out = compressor.finish()
+            size_out += len(out)
+            yield out
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+            self._count('br' if isinstance(compressor, _Brotli) else 'gzip', size_in, size_out)
+
+    def _count(self, encoding, size_in, size_out):
+        with self._lock:
+            self.responses[encoding] += 1
+            self.bytes_in += size_in
+            self.bytes_out += size_out
+
+    def stats(self):
+        return {
+            'responses': dict(self.responses),
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'ratio': round(self.bytes_out / self.bytes_in, 3) if self.bytes_in else None,
+        }
+
+
+compression = Compression()
@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+import click
+
+from app import rollup
+from . import dashboard, reminders
+
+
+@dashboard.cli.command('send-reminders')
+@click.option('--user-id', type=int, default=None, help='Only remind this user\'s clients (default: every user).')
+@click.option('--rate', type=float, default=None, help='Messages per second, 0 for no limit (default: REMINDER_RATE_LIMIT).')
+@click.option('--cooldown-hours', type=float, default=None, help='Skip invoices reminded more recently than this.')
+@click.option('--dry-run', is_flag=True, help='Only report how many invoices would be reminded.')
+def send_reminders_command(user_id, rate, cooldown_hours, dry_run):
+    """Email a payment reminder for every overdue unpaid invoice."""
+    cooldown = timedelta(hours=cooldown_hours) if cooldown_hours is not None else None
+    run = reminders.send_overdue_reminders(user_id=user_id, rate_limit=rate, cooldown=cooldown, dry_run=dry_run)
+    if dry_run:
+        click.echo(f'{run.selected} invoice(s) would be reminded.')
+    else:
+        click.echo(f'Sent {run.sent} of {run.selected} reminder(s), {run.failed} rejected.')
+
+
+@dashboard.cli.command('rebuild-rollup')
+@click.option('--user-id', type=int, default=None, help='Only rebuild this user\'s months (default: everyone).')
+def rebuild_rollup_command(user_id):
+    """Recompute the monthly revenue rollup from the invoices table."""
+    rollup.rebuild(user_id=user_id)
+    click.echo('Monthly revenue rollup rebuilt.')
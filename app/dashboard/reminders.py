@@ -0,0 +1,169 @@
+# app/dashboard/reminders.py
+
+import logging
+import os
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app, render_template
+from flask_mail import Message
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import contains_eager
+
+from app import db, mail
+from app.status import OVERDUE, UNPAID, mark_overdue, today
+from app.models import Client, Invoice
+
+logger = logging.getLogger(__name__)
+
+
+def overdue_invoices(user_id=None, now=None, cooldown=None, past_due=False):
+    """Overdue invoices with a reachable client, not reminded within ``cooldown``.
+
+    With ``past_due``, unpaid invoices that mark_overdue() would move to
+    overdue count too, for callers that mustn't write.
+    """
+    now = now or datetime.utcnow()
+    if cooldown is None:
+        cooldown = timedelta(hours=current_app.config['REMINDER_COOLDOWN_HOURS'])
+    overdue = Invoice.status == OVERDUE
+    if past_due:
+        overdue = or_(overdue, and_(Invoice.status == UNPAID, Invoice.due_date < today()))
+    query = Invoice.query.join(Invoice.client).options(contains_eager(Invoice.client)).filter(
+        overdue,
+        Client.email.isnot(None),
+        Client.email != '',
+        or_(Invoice.last_reminded_at.is_(None), Invoice.last_reminded_at < now - cooldown),
+    )
+    if user_id is not None:
+        query = query.filter(Invoice.user_id == user_id)
+    return query.order_by(Invoice.user_id, Invoice.id)
+
+
+def reminder_message(invoice):
+    msg = Message(
+        f"Payment Reminder for Invoice #{invoice.id}",
+        sender=os.getenv('MAIL_DEFAULT_SENDER') or os.getenv('MAIL_USERNAME'),
+        recipients=[invoice.client.email],
+    )
+    msg.body = render_template('reminder_email.txt', invoice=invoice)
+    msg.html = render_template('reminder_email.html', invoice=invoice)
+    return msg
+
+
+class ReminderRun:
+    def __init__(self):
+        self.selected = 0
+        self.sent = 0
+        self.failed = 0
+
+
+def send_overdue_reminders(user_id=None, rate_limit=None, cooldown=None, dry_run=False, commit_every=50):
+    """Send one reminder per eligible invoice over a single SMTP connection.
+
+    ``rate_limit`` is messages per second (0 for no limit). ``last_reminded_at``
+    is committed every ``commit_every`` sends, so an interrupted run never
+    re-mails the invoices it already reached. A ``dry_run`` only counts the
+    invoices and writes nothing.
+    """
+    if rate_limit is None:
+        rate_limit = current_app.config['REMINDER_RATE_LIMIT']
+    interval = 1.0 / rate_limit if rate_limit else 0.0
+    now = datetime.utcnow()
+
+    run = ReminderRun()
+    if not dry_run:
+        # Don't wait for the scheduler to notice invoices that fell due since its last run
+        mark_overdue(user_id=user_id)
+    invoices = overdue_invoices(user_id=user_id, now=now, cooldown=cooldown, past_due=dry_run).all()
+    run.selected = len(invoices)
+    if dry_run or not invoices:
+        return run
+
+    next_slot = time.monotonic()
+    try:
+        with mail.connect() as conn:
+            for invoice in invoices:
+                delay = next_slot - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                next_slot = max(next_slot, time.monotonic()) + interval
+                try:
+                    conn.send(reminder_message(invoice))
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError, smtplib.SMTPSenderRefused):
+                    # Rejected for this recipient only; the session is still usable.
+                    run.failed += 1
+                    logger.warning('Reminder for invoice %s rejected', invoice.id, exc_info=True)
+                    continue
+                invoice.last_reminded_at = now
+                run.sent += 1
+                if run.sent % commit_every == 0:
+                    db.session.commit()
+    finally:
+        db.session.commit()
+    return run
+
+
+class ReminderRunner:
+    """Runs send_overdue_reminders() for the dashboard on a background thread.
+
+    A rate-limited run can take minutes, far longer than a request should.
+    One thread serves every user, so concurrent runs share the SMTP rate
+    limit instead of multiplying it, and a user with a run still queued or
+    going can't start a second one.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._active = set()
+
+    def _pool(self):
+        # Executor threads don't survive a fork; build the pool in the serving process.
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(1, thread_name_prefix='reminders')
+                    self._active = set()
+                    self._pid = os.getpid()
+        return self._executor
+
+    def start(self, user_id):
+        """Queue a run for ``user_id``; returns how many reminders it will send, or None if one is already running."""
+        pool = self._pool()
+        with self._lock:
+            if user_id in self._active:
+                return None
+            self._active.add(user_id)
+        try:
+            selected = send_overdue_reminders(user_id=user_id, dry_run=True).selected
+            if selected:
+                pool.submit(self._run, current_app._get_current_object(), user_id)
+        except BaseException:
+            self._done(user_id)
+            raise
+        if not selected:
+            self._done(user_id)
+        return selected
+
+    def _run(self, app, user_id):
+        try:
+            with app.app_context():
+                run = send_overdue_reminders(user_id=user_id)
+            logger.info('Reminders for user %s: sent %d of %d, %d rejected',
+                        user_id, run.sent, run.selected, run.failed)
+        except Exception:
+            logger.exception('Reminder run for user %s failed', user_id)
+        finally:
+            self._done(user_id)
+
+    def _done(self, user_id):
+        with self._lock:
+            self._active.discard(user_id)
+
+
+runner = ReminderRunner()
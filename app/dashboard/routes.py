@@ -2,29 +2,30 @@ from flask import render_template
 from flask import request, redirect, url_for, flash
 from app.email import send_email
 from flask_login import login_required, current_user
-from app.models import Client, Invoice
-from datetime import datetime
-from sqlalchemy import extract, func , case
+from app.models import Client, Invoice, MonthlyRevenue
+from app.status import today
+from datetime import date, datetime
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
 from . import dashboard  # ✅ this is how you use the already created blueprint
+from . import reminders
+from .stats import dashboard_stats
 import os
 from app import db
+from app.replicas import read_only
 @dashboard.route('/')
 @login_required
+@read_only
 def index():
     user_id = current_user.id
 
-    total_clients = Client.query.filter_by(user_id=user_id).count()
-    total_invoices = Invoice.query.filter_by(user_id=user_id).count()
-    paid_invoices = Invoice.query.filter_by(user_id=user_id, status='paid').count()
-    unpaid_invoices = total_invoices - paid_invoices
-    recent_invoices = Invoice.query.filter_by(user_id=user_id).order_by(Invoice.issue_date.desc()).limit(5).all()
+    stats = dashboard_stats(user_id)
+    recent_invoices = Invoice.query.filter_by(user_id=user_id).options(joinedload(Invoice.client)) \
+        .order_by(Invoice.issue_date.desc()).limit(5).all()
 
     return render_template('dashboard.html',
-        total_clients=total_clients,
-        total_invoices=total_invoices,
-        paid_invoices=paid_invoices,
-        unpaid_invoices=unpaid_invoices,
-        recent_invoices=recent_invoices
+        recent_invoices=recent_invoices,
+        **stats
     )
 @dashboard.route('/send-reminder/<int:invoice_id>', methods=['POST'])
 @login_required
@@ -40,29 +41,16 @@ def send_reminder(invoice_id):
         flash("Client does not have a valid email.", "danger")
         return redirect(url_for('dashboard.index'))
 
-    subject = f"Payment Reminder for Invoice #{invoice.id}"
-    body = f"""
-    Hello {client.name},
-
-    This is a reminder that your invoice #{invoice.id} is still unpaid.
-
-    Amount Due: ${invoice.total_amount}
-    Due Date: {invoice.due_date.strftime('%B %d, %Y')}
-
-    Please make the payment as soon as possible.
-
-    Regards,
-    Mini Invoice SaaS
-    """
-
     try:
         send_email(
-            subject=subject,
+            subject=f"Payment Reminder for Invoice #{invoice.id}",
             sender=os.getenv('MAIL_DEFAULT_SENDER'),
             recipients=[client.email],
-            text_body=body,
-            html_body=body  # you can use a Jinja2 HTML template if you prefer
+            text_body=render_template('reminder_email.txt', invoice=invoice),
+            html_body=render_template('reminder_email.html', invoice=invoice)
         )
+        invoice.last_reminded_at = datetime.utcnow()
+        db.session.commit()
         flash("Reminder email sent successfully.", "success")
     except Exception as e:
         flash(f"Failed to send email: {str(e)}", "danger")
@@ -70,43 +58,43 @@ def send_reminder(invoice_id):
     return redirect(url_for('dashboard.index'))
 
 
-
+@dashboard.route('/send-reminders', methods=['POST'])
+@login_required
+def send_overdue_reminders():
+    queued = reminders.runner.start(current_user.id)
+    if queued is None:
+        flash("Reminders are already being sent; check back in a few minutes.", "info")
+    elif not queued:
+        flash("No overdue invoices need a reminder right now.", "info")
+    else:
+        flash(f"Sending {queued} reminder(s) in the background.", "success")
+    return redirect(url_for('dashboard.index'))
 
 
 @dashboard.route('/reports')
 @login_required
+@read_only
 def reports():
     user_id = current_user.id
 
-    # Total revenue from paid invoices
-    total_revenue = db.session.query(
-        func.sum(Invoice.total_amount)
-    ).filter_by(user_id=user_id, status='paid').scalar() or 0
+    # Per-month totals come from the rollup table, so this is O(months)
+    months = MonthlyRevenue.query.filter_by(user_id=user_id) \
+        .order_by(MonthlyRevenue.year, MonthlyRevenue.month).all()
 
-    # Revenue for current month
-    now = datetime.utcnow()
-    revenue_this_month = db.session.query(
-        func.sum(Invoice.total_amount)
-    ).filter(
-        Invoice.user_id == user_id,
-        Invoice.status == 'paid',
-        extract('month', Invoice.issue_date) == now.month,
-        extract('year', Invoice.issue_date) == now.year
-    ).scalar() or 0
-
-    # Unpaid and overdue counts
-    unpaid_count = Invoice.query.filter_by(user_id=user_id, status='unpaid').count()
-    overdue_count = Invoice.query.filter(
-        Invoice.user_id == user_id,
-        Invoice.status == 'unpaid',
-        Invoice.due_date < datetime.utcnow()
-    ).count()
+    now = today()
+    total_revenue = sum(m.paid_revenue for m in months)
+    revenue_this_month = next(
+        (m.paid_revenue for m in months if (m.year, m.month) == (now.year, now.month)), 0)
+
+    # Overdue is a stored status (see app/status.py), so every count is in the rollup
+    overdue_count = sum(m.overdue_count for m in months)
+    unpaid_count = sum(m.unpaid_count for m in months) + overdue_count
 
     # Invoice status counts
-    paid_count = Invoice.query.filter_by(user_id=user_id, status='paid').count()
+    paid_count = sum(m.paid_count for m in months)
     invoice_status_counts = {
         'paid': paid_count,
-        'unpaid': unpaid_count,
+        'unpaid': unpaid_count - overdue_count,
         'overdue': overdue_count
     }
 
@@ -119,14 +107,12 @@ def reports():
         Invoice.status == 'paid'
     ).group_by(Client.name).order_by(func.sum(Invoice.total_amount).desc()).limit(3).all()
 
-    # Monthly summary
-    monthly_summary = db.session.query(
-    func.to_char(Invoice.issue_date, 'Month YYYY').label('month_name'),
-    func.count(Invoice.id).label('total'),
-    func.sum(Invoice.total_amount).label('revenue'),
-    func.sum(case((Invoice.status == 'paid', 1), else_=0)).label('paid'),
-    func.sum(case((Invoice.status == 'unpaid', 1), else_=0)).label('unpaid')
-    ).filter_by(user_id=user_id).group_by('month_name').order_by('month_name').all()
+    # Monthly summary, oldest first
+    monthly_summary = [
+        (date(m.year, m.month, 1).strftime('%B %Y'), m.invoice_count, m.revenue, m.paid_count,
+         m.unpaid_count + m.overdue_count)
+        for m in months
+    ]
     return render_template('reports.html',
         total_revenue=total_revenue,
         revenue_this_month=revenue_this_month,
@@ -0,0 +1,37 @@
+# app/dashboard/stats.py
+
+from sqlalchemy import case, func, select
+
+from app import db
+from app.cache import TTLCache
+from app.models import Client, Invoice
+
+stats_cache = TTLCache('dashboard_stats_cache', maxsize=10000)
+
+
+def compute_dashboard_stats(user_id):
+    """Client, invoice and paid counts for one user in a single round-trip."""
+    client_count = select(func.count(Client.id)).where(Client.user_id == user_id).scalar_subquery()
+    total_clients, total_invoices, paid_invoices = db.session.query(
+        client_count,
+        func.count(Invoice.id),
+        func.coalesce(func.sum(case((Invoice.status == 'paid', 1), else_=0)), 0),
+    ).filter(Invoice.user_id == user_id).one()
+    return {
+        'total_clients': total_clients,
+        'total_invoices': total_invoices,
+        'paid_invoices': paid_invoices,
+        'unpaid_invoices': total_invoices - paid_invoices,
+    }
+
+
+def dashboard_stats(user_id):
+    stats = stats_cache.get(user_id)
+    if stats is None:
+        stats = compute_dashboard_stats(user_id)
+        stats_cache.set(user_id, stats)
+    return stats
+
+
+def invalidate_user_stats(user_id):
+    stats_cache.delete(user_id)
@@ -1,13 +1,164 @@
 # app/email.py
 
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+
 from flask_mail import Message
-from flask import current_app
-from app import mail
-from threading import Thread
+from app import mail, metrics
+
+logger = logging.getLogger(__name__)
+
+
+class MailQueueFull(Exception):
+    pass
+
+
+class MailDispatcher:
+    """Bounded outbound mail queue drained by a fixed pool of worker threads.
+
+    Each worker pulls up to MAIL_BATCH_SIZE queued messages and sends them
+    over one SMTP connection. A message that fails is retried on a fresh
+    connection with exponential backoff, up to MAIL_MAX_RETRIES times.
+    """
+
+    def __init__(self):
+        self.app = None
+        self._queue = None
+        self._threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=1000)
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.connections = 0
+
+    def init_app(self, app):
+        self.app = app
+        self.workers = app.config['MAIL_WORKERS']
+        self.batch_size = app.config['MAIL_BATCH_SIZE']
+        self.max_retries = app.config['MAIL_MAX_RETRIES']
+        self.retry_backoff = app.config['MAIL_RETRY_BACKOFF']
+        self.enqueue_timeout = app.config['MAIL_ENQUEUE_TIMEOUT']
+        self._queue = queue.Queue(maxsize=app.config['MAIL_QUEUE_SIZE'])
+        app.extensions['mail_dispatcher'] = self
+        metrics.register('mail', self.stats)
+
+    def _ensure_started(self):
+        # Threads don't survive a fork, so start them in the process that sends.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._threads = [
+                threading.Thread(target=self._run, name=f'mail-worker-{i}', daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+            self._pid = os.getpid()
+
+    def enqueue(self, msg):
+        self._ensure_started()
+        try:
+            self._queue.put((msg, time.monotonic()), timeout=self.enqueue_timeout)
+        except queue.Full:
+            raise MailQueueFull(msg.subject) from None
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    # Shutdown sentinel: hand it back for this worker's next loop.
+                    self._queue.task_done()
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+            try:
+                with self.app.app_context():
+                    self._deliver(batch)
+            except Exception:
+                logger.exception('Mail worker crashed delivering %d message(s)', len(batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _deliver(self, batch):
+        pending = deque((msg, enqueued, 0) for msg, enqueued in batch)
+        while pending:
+            try:
+                with mail.connect() as conn:
+                    self.connections += 1
+                    while pending:
+                        msg, enqueued, _ = pending[0]
+                        conn.send(msg)
+                        pending.popleft()
+                        self.sent += 1
+                        self._latencies.append(time.monotonic() - enqueued)
+            except Exception:
+                msg, enqueued, attempts = pending.popleft()
+                attempts += 1
+                if attempts > self.max_retries:
+                    self.failed += 1
+                    logger.exception('Giving up on mail %r to %s after %d attempts',
+                                     msg.subject, msg.recipients, attempts)
+                    continue
+                self.retries += 1
+                logger.warning('Mail %r to %s failed (attempt %d), retrying',
+                               msg.subject, msg.recipients, attempts, exc_info=True)
+                pending.appendleft((msg, enqueued, attempts))
+                time.sleep(self.retry_backoff * 2 ** (attempts - 1))
+
+    def flush(self):
+        """Block until every queued message has been sent or given up on."""
+        if self._queue is not None:
+            self._queue.join()
+
+    def shutdown(self, timeout=10):
+        if self._pid != os.getpid():
+            return
+        for _ in self._threads:
+            self._queue.put(None)
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0, deadline - time.monotonic()))
+        self._threads = []
+        self._pid = None
+
+    def stats(self):
+        latencies = sorted(self._latencies)
+        return {
+            'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+            'queue_size': self._queue.maxsize if self._queue is not None else 0,
+            'workers': len(self._threads),
+            'sent': self.sent,
+            'failed': self.failed,
+            'retries': self.retries,
+            'connections': self.connections,
+            'latency_avg': sum(latencies) / len(latencies) if latencies else 0.0,
+            'latency_p95': latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+            'latency_max': latencies[-1] if latencies else 0.0,
+        }
+
+
+dispatcher = MailDispatcher()
+atexit.register(dispatcher.shutdown)
 
-def send_async_email(app, msg):
-    with app.app_context():
-        mail.send(msg)
 
 def send_email(subject, sender, recipients, text_body, html_body, attachments=None, sync=False):
     msg = Message(subject, sender=sender, recipients=recipients)
@@ -19,4 +170,4 @@ def send_email(subject, sender, recipients, text_body, html_body, attachments=No
     if sync:
         mail.send(msg)
     else:
-        Thread(target=send_async_email, args=(current_app._get_current_object(), msg)).start()
+        dispatcher.enqueue(msg)
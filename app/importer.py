@@ -0,0 +1,303 @@
+# app/importer.py
+#
+# Streaming CSV import. Rows are read one at a time, validated and inserted
+# in chunks with executemany-style bulk INSERTs, one transaction per chunk,
+# so memory stays flat however large the file is. A bad row is reported and
+# skipped; it never aborts the rest of the file.
+
+import csv
+import io
+import logging
+from datetime import date
+from itertools import islice
+
+import validators
+from sqlalchemy import insert, select
+from sqlalchemy.exc import DBAPIError
+
+from app import db, rollup
+from app.dashboard.stats import invalidate_user_stats
+from app.status import status_for, today as status_today
+from app.models import Client, Invoice, LineItem
+
+logger = logging.getLogger(__name__)
+
+CLIENT_COLUMNS = ('name', 'email', 'phone', 'company', 'notes')
+INVOICE_COLUMNS = ('invoice_ref', 'client_email', 'client_id', 'issue_date', 'due_date', 'status',
+                   'description', 'quantity', 'unit_price')
+MAX_REPORTED_ERRORS = 1000
+
+
+class RowError(ValueError):
+    pass
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+
+    def error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    @property
+    def errors_truncated(self):
+        return self.failed > len(self.errors)
+
+
+def _text_stream(stream):
+    if isinstance(stream, io.TextIOBase):
+        return stream
+    return io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+
+def _rows(stream, required):
+    reader = csv.DictReader(_text_stream(stream))
+    missing = [c for c in required if c not in (reader.fieldnames or ())]
+    if missing:
+        raise RowError(f"Missing column(s): {', '.join(missing)}")
+    for row in reader:
+        yield reader.line_num, {k: (v or '').strip() for k, v in row.items() if k}
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _text(row, name, max_length, required=False):
+    value = row.get(name) or None
+    if value is None and required:
+        raise RowError(f'{name} is required')
+    if value is not None and len(value) > max_length:
+        raise RowError(f'{name} is longer than {max_length} characters')
+    return value
+
+
+def _date(row, name):
+    try:
+        return date.fromisoformat(row.get(name, ''))
+    except ValueError:
+        raise RowError(f'{name} must be a YYYY-MM-DD date') from None
+
+
+def _number(row, name, kind, minimum):
+    try:
+        value = kind(row.get(name, ''))
+    except ValueError:
+        raise RowError(f'{name} must be a number') from None
+    if value < minimum:
+        raise RowError(f'{name} must be at least {minimum}')
+    return value
+
+
+# ---- clients ----
+
+def _client_values(row, user_id):
+    email = _text(row, 'email', 120)
+    if email is not None and not validators.email(email):
+        raise RowError(f'invalid email {email!r}')
+    return {
+        'user_id': user_id,
+        'name': _text(row, 'name', 100, required=True),
+        'email': email,
+        'phone': _text(row, 'phone', 20),
+        'company': _text(row, 'company', 100),
+        'notes': row.get('notes') or None,
+    }
+
+
+def _insert_rows(model, rows, report):
+    """Bulk insert ``(line, values)`` pairs; on a database error, isolate the bad rows."""
+    try:
+        db.session.execute(insert(model), [values for _, values in rows])
+        db.session.commit()
+        report.created += len(rows)
+        return
+    except DBAPIError:
+        db.session.rollback()
+    for line, values in rows:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(model), [values])
+            report.created += 1
+        except DBAPIError as exc:
+            report.error(line, str(exc.orig))
+    db.session.commit()
+
+
+def import_clients(stream, user_id, batch_size=1000):
+    report = ImportReport()
+    try:
+        rows = _rows(stream, required=('name',))
+        for chunk in _chunks(rows, batch_size):
+            valid = []
+            for line, row in chunk:
+                report.rows += 1
+                try:
+                    valid.append((line, _client_values(row, user_id)))
+                except RowError as exc:
+                    report.error(line, str(exc))
+            if valid:
+                _insert_rows(Client, valid, report)
+    except RowError as exc:
+        report.error(1, str(exc))
+    except (UnicodeDecodeError, csv.Error) as exc:
+        report.error(0, f'Unreadable CSV: {exc}')
+    invalidate_user_stats(user_id)
+    return report
+
+
+# ---- invoices ----
+#
+# One CSV row per line item; consecutive rows sharing an invoice_ref make up
+# one invoice, whose client/date/status columns are taken from its first row.
+
+def _group_invoices(rows):
+    current_ref, group = None, []
+    for line, row in rows:
+        ref = row.get('invoice_ref') or f'line-{line}'
+        if group and ref != current_ref:
+            yield group
+            group = []
+        current_ref = ref
+        group.append((line, row))
+    if group:
+        yield group
+
+
+def _parse_invoice(group, user_id, today):
+    line, first = group[0]
+    status = (first.get('status') or 'unpaid').lower()
+    if status not in ('paid', 'unpaid'):
+        raise RowError(f'status must be paid or unpaid, not {status!r}')
+    client_id = first.get('client_id') or None
+    if client_id is not None and not client_id.isdigit():
+        raise RowError('client_id must be an integer')
+    client_email = (first.get('client_email') or '').lower() or None
+    if client_id is None and client_email is None:
+        raise RowError('client_email or client_id is required')
+
+    items, total = [], 0.0
+    for item_line, row in group:
+        try:
+            quantity = _number(row, 'quantity', int, 1)
+            unit_price = _number(row, 'unit_price', float, 0.0)
+            items.append({
+                'description': _text(row, 'description', 200, required=True),
+                'quantity': quantity,
+                'unit_price': unit_price,
+                'total': quantity * unit_price,
+            })
+        except RowError as exc:
+            raise RowError(f'line {item_line}: {exc}') from None
+        total += quantity * unit_price
+
+    due_date = _date(first, 'due_date')
+    return {
+        'line': line,
+        'client_id': int(client_id) if client_id else None,
+        'client_email': client_email,
+        'invoice': {
+            'user_id': user_id,
+            'issue_date': _date(first, 'issue_date'),
+            'due_date': due_date,
+            'status': status_for(status, due_date, on=today),
+            'total_amount': total,
+        },
+        'items': items,
+    }
+
+
+def _resolve_clients(parsed, user_id):
+    """Look up every client a batch references with two IN queries."""
+    ids = {p['client_id'] for p in parsed if p['client_id'] is not None}
+    emails = {p['client_email'] for p in parsed if p['client_id'] is None}
+    owned_ids, by_email = set(), {}
+    if ids:
+        owned_ids = set(db.session.scalars(
+            select(Client.id).where(Client.user_id == user_id, Client.id.in_(ids))))
+    if emails:
+        rows = db.session.execute(
+            select(Client.id, db.func.lower(Client.email))
+            .where(Client.user_id == user_id, db.func.lower(Client.email).in_(emails))
+            .order_by(Client.id.desc()))
+        # Oldest client wins when several share an address.
+        by_email = {email: client_id for client_id, email in rows}
+    return owned_ids, by_email
+
+
+def _write_invoices(batch):
+    invoice_ids = db.session.scalars(
+        insert(Invoice).returning(Invoice.id, sort_by_parameter_order=True),
+        [p['invoice'] for p in batch],
+    ).all()
+    items = []
+    for invoice_id, p in zip(invoice_ids, batch):
+        for item in p['items']:
+            items.append({**item, 'invoice_id': invoice_id})
+    if items:
+        db.session.execute(insert(LineItem), items)
+    rollup.add_invoices(rollup.InvoiceSnapshot(
+        p['invoice']['user_id'], p['invoice']['client_id'], p['invoice']['issue_date'],
+        p['invoice']['total_amount'], p['invoice']['status'])
+        for p in batch)
+
+
+def _insert_invoices(batch, report):
+    """Bulk insert parsed invoices with their line items; on a database error, isolate the bad invoices."""
+    try:
+        _write_invoices(batch)
+        db.session.commit()
+        report.created += len(batch)
+        return
+    except DBAPIError:
+        db.session.rollback()
+        logger.warning('Invoice import batch failed, retrying invoice by invoice', exc_info=True)
+    for p in batch:
+        try:
+            with db.session.begin_nested():
+                _write_invoices([p])
+            report.created += 1
+        except DBAPIError as exc:
+            report.error(p['line'], str(exc.orig))
+    db.session.commit()
+
+
+def import_invoices(stream, user_id, batch_size=500):
+    report = ImportReport()
+    today = status_today()
+    try:
+        rows = _rows(stream, required=('issue_date', 'due_date', 'description', 'quantity', 'unit_price'))
+        for chunk in _chunks(_group_invoices(rows), batch_size):
+            parsed = []
+            for group in chunk:
+                report.rows += len(group)
+                try:
+                    parsed.append(_parse_invoice(group, user_id, today))
+                except RowError as exc:
+                    report.error(group[0][0], str(exc))
+
+            owned_ids, by_email = _resolve_clients(parsed, user_id)
+            batch = []
+            for p in parsed:
+                client_id = p['client_id'] if p['client_id'] in owned_ids else by_email.get(p['client_email'])
+                if client_id is None:
+                    report.error(p['line'], f"unknown client {p['client_id'] or p['client_email']!r}")
+                    continue
+                p['invoice']['client_id'] = client_id
+                batch.append(p)
+
+            if batch:
+                _insert_invoices(batch, report)
+    except RowError as exc:
+        report.error(1, str(exc))
+    except (UnicodeDecodeError, csv.Error) as exc:
+        report.error(0, f'Unreadable CSV: {exc}')
+    invalidate_user_stats(user_id)
+    return report
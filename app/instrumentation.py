@@ -0,0 +1,244 @@
+# app/instrumentation.py
+#
+# Per-endpoint request latency, SQL statement counts and DB time, N+1
+# detection and PDF render latency, exposed in Prometheus text format on
+# /metrics, which is only served when METRICS_TOKEN is set. SQL is counted
+# from SQLAlchemy engine events and attributed to the request running in
+# the current context; statements issued outside a request (CLI,
+# scheduler) are counted under endpoint="(no request)".
+
+import hmac
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from flask import Response, abort, current_app, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250, 500)
+PDF_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Expanded IN lists differ only in their number of placeholders.
+_IN_LIST = re.compile(r'\((?:\s*(?:\?|%s|%\(\w+\)s)\s*,)+\s*(?:\?|%s|%\(\w+\)s)\s*\)')
+_SPACE = re.compile(r'\s+')
+
+
+def statement_shape(statement):
+    return _IN_LIST.sub('(?)', _SPACE.sub(' ', statement).strip())
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label tuple, as Prometheus expects."""
+
+    def __init__(self, name, help, labels, buckets):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += 1
+            series[2] += value
+
+    def exposition(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = [(labels, list(s[0]), s[1], s[2]) for labels, s in self._series.items()]
+        for labels, counts, count, total in sorted(items):
+            base = _labels(self.labels, labels)
+            for bound, bucket in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{_labels(self.labels + ("le",), labels + (bound,))} {bucket}')
+            lines.append(f'{self.name}_bucket{_labels(self.labels + ("le",), labels + ("+Inf",))} {count}')
+            lines.append(f'{self.name}_count{base} {count}')
+            lines.append(f'{self.name}_sum{base} {total:.6f}')
+        return lines
+
+
+class CounterMetric:
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = Counter()
+        self._lock = threading.Lock()
+
+    def inc(self, amount, *labels):
+        with self._lock:
+            self._values[labels] += amount
+
+    def exposition(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f'{self.name}{_labels(self.labels, labels)} {value:g}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + '}'
+
+
+class RequestStats:
+    __slots__ = ('started', 'statements', 'db_seconds', 'shapes', 'status')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.shapes = Counter()
+        self.status = 500
+
+
+_current = ContextVar('request_stats', default=None)
+
+
+class Instrumentation:
+    def __init__(self):
+        self.request_seconds = Histogram(
+            'http_request_duration_seconds', 'Time spent handling a request.',
+            ('endpoint', 'method'), LATENCY_BUCKETS)
+        self.requests = CounterMetric(
+            'http_requests_total', 'Requests handled, by response status.', ('endpoint', 'method', 'status'))
+        self.request_statements = Histogram(
+            'db_statements_per_request', 'SQL statements executed by one request.',
+            ('endpoint',), STATEMENT_BUCKETS)
+        self.db_seconds = CounterMetric(
+            'db_duration_seconds_total', 'Time spent waiting on SQL statements.', ('endpoint',))
+        self.statements = CounterMetric(
+            'db_statements_total', 'SQL statements executed.', ('endpoint',))
+        self.n_plus_one = CounterMetric(
+            'db_n_plus_one_requests_total', 'Requests that repeated one statement shape too often.',
+            ('endpoint',))
+        # Measured in this process, so it includes time queued behind other renders.
+        self.pdf_seconds = Histogram(
+            'pdf_render_latency_seconds',
+            'PDF render latency, from submission to the pool until done (queue wait included).',
+            (), PDF_BUCKETS)
+        self.slow_requests = 0
+        self._listening = False
+
+    def init_app(self, app):
+        self.slow_ms = app.config['SLOW_REQUEST_MS']
+        self.n_plus_one_threshold = app.config['N_PLUS_ONE_THRESHOLD']
+        app.extensions['instrumentation'] = self
+        if not self._listening:
+            # Every engine, replicas included; the listener finds its request via a ContextVar.
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+            self._listening = True
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        # Never public: without a token there is no /metrics at all.
+        if app.config['METRICS_ENABLED'] and app.config['METRICS_TOKEN']:
+            app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+
+    def _before_request(self):
+        _current.set(RequestStats())
+
+    def _after_request(self, response):
+        stats = _current.get()
+        if stats is not None:
+            stats.status = response.status_code
+        return response
+
+    def _teardown_request(self, exc):
+        stats = _current.get()
+        _current.set(None)
+        if stats is None:
+            return
+        elapsed = time.perf_counter() - stats.started
+        endpoint = request.endpoint or 'unmatched'
+        self.request_seconds.observe(elapsed, endpoint, request.method)
+        self.requests.inc(1, endpoint, request.method, str(stats.status))
+        self.request_statements.observe(stats.statements, endpoint)
+        self.statements.inc(stats.statements, endpoint)
+        self.db_seconds.inc(stats.db_seconds, endpoint)
+
+        repeated = [(shape, n) for shape, n in stats.shapes.items() if n > self.n_plus_one_threshold]
+        if repeated:
+            self.n_plus_one.inc(1, endpoint)
+            for shape, n in repeated:
+                logger.warning('Possible N+1 in %s: %d executions of %s', endpoint, n, shape[:300])
+
+        if self.slow_ms and elapsed * 1000 >= self.slow_ms:
+            self.slow_requests += 1
+            logger.warning('Slow request: %s %s (%s) %d in %.0f ms, %d statements, %.0f ms in the database',
+                           request.method, request.full_path.rstrip('?'), endpoint, stats.status,
+                           elapsed * 1000, stats.statements, stats.db_seconds * 1000)
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop('instrumentation_started', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        stats = _current.get()
+        if stats is None:
+            self.statements.inc(1, '(no request)')
+            self.db_seconds.inc(elapsed, '(no request)')
+            return
+        stats.statements += 1
+        stats.db_seconds += elapsed
+        stats.shapes[statement_shape(statement)] += 1
+
+    def observe_pdf_latency(self, seconds):
+        self.pdf_seconds.observe(seconds)
+
+    def exposition(self):
+        lines = []
+        for metric in (self.request_seconds, self.requests, self.request_statements, self.statements,
+                       self.db_seconds, self.n_plus_one, self.pdf_seconds):
+            lines += metric.exposition()
+        lines += _gauges(metrics.collect())
+        return '\n'.join(lines) + '\n'
+
+    def metrics_view(self):
+        token = current_app.config['METRICS_TOKEN']
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not token or not hmac.compare_digest(supplied.encode(), token.encode()):
+            abort(401)
+        return Response(self.exposition(), mimetype='text/plain; version=0.0.4')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['instrumentation_started'] = time.perf_counter()
+
+
+def _gauges(collected, prefix='app'):
+    """The /stats providers' numeric values, flattened into untyped gauges."""
+    lines = []
+    for key, value in collected.items():
+        name = f'{prefix}_{re.sub(r"[^a-zA-Z0-9_]", "_", str(key))}'
+        if isinstance(value, dict):
+            lines += _gauges(value, name)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines.append(f'{name} {value:g}')
+    return lines
+
+
+instrumentation = Instrumentation()
@@ -2,4 +2,4 @@ from flask import Blueprint
 
 invoices = Blueprint('invoices', __name__)
 
-from . import routes  # Import routes after defining blueprint
+from . import routes, commands  # Import routes after defining blueprint
@@ -0,0 +1,72 @@
+# app/invoices/caching.py
+#
+# HTTP validators and a rendered-page cache for single invoices, both keyed
+# on Invoice.version. The version only covers the invoice's own data (and its
+# client's name and company, see changes.client_details_changed); the
+# digest of the templates involved and the asset build cover deploys.
+
+import hashlib
+from functools import lru_cache
+
+from flask import abort, current_app, render_template, request, session
+from markupsafe import Markup
+from werkzeug.http import is_resource_modified
+
+from app import db
+from app.cache import TTLCache
+from app.models import Invoice
+
+fragment_cache = TTLCache('invoice_fragment_cache', maxsize=2000, ttl=600)
+
+
+@lru_cache(maxsize=None)
+def template_digest(*names):
+    env = current_app.jinja_env
+    digest = hashlib.sha1()
+    for name in names:
+        source, _, _ = env.loader.get_source(env, name)
+        digest.update(source.encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def validators(invoice_id, user_id, *templates, vary=''):
+    """``(version, etag, last_modified)`` of the user's invoice, from one narrow query; 404s if missing.
+
+    ``vary`` is anything else that ends up in the response, such as the user's name in the nav bar.
+    """
+    row = db.session.query(Invoice.version, Invoice.updated_at) \
+        .filter(Invoice.id == invoice_id, Invoice.user_id == user_id).first()
+    if row is None:
+        abort(404)
+    version, updated_at = row
+    assets_version = current_app.extensions['assets'].version
+    etag = hashlib.sha1(
+        f'{invoice_id}:{version}:{template_digest(*templates)}:{assets_version}:{vary}'.encode('utf-8')).hexdigest()
+    return version, etag, updated_at
+
+
+def not_modified(etag, last_modified):
+    # A pending flash message would otherwise be swallowed by a 304.
+    if session.get('_flashes'):
+        return False
+    return not is_resource_modified(request.environ, etag=etag, last_modified=last_modified)
+
+
+def validated(response, etag, last_modified):
+    """Strong validators; no-cache so every use of the page revalidates cheaply."""
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def invoice_body(invoice_id, version, load):
+    """The rendered view_invoice body for this version, calling ``load()`` for the invoice on a miss."""
+    digest = template_digest('view_invoice_body.html')
+    html = fragment_cache.get((invoice_id, version, digest))
+    if html is None:
+        invoice = load()
+        html = Markup(render_template('view_invoice_body.html', invoice=invoice))
+        # Keyed by what was rendered, in case the invoice changed since ``version`` was read
+        fragment_cache.set((invoice_id, invoice.version, digest), html)
+    return html
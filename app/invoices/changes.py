@@ -0,0 +1,92 @@
+# app/invoices/changes.py
+#
+# Bookkeeping shared by everything that writes invoices (the HTML routes and
+# the JSON API): line item totals, updated_at, and the per-user caches that
+# must be dropped once the change is committed.
+
+from datetime import datetime
+
+from sqlalchemy import update
+
+from app import db
+from app.dashboard.stats import invalidate_user_stats
+from app.models import Invoice, LineItem
+from app.pdf import pdf_cache
+
+
+def touch(invoice):
+    # onupdate only fires when the invoice row itself changes; line item
+    # edits must bump it explicitly.
+    invoice.updated_at = datetime.utcnow()
+
+
+def set_line_items(invoice, items):
+    """Make the invoice's line items match ``items`` and recompute the total.
+
+    ``items`` are description/quantity/unit_price dicts; one carrying the
+    ``id`` of an existing line item on this invoice updates that row (only if
+    something changed), items without a known id are inserted, and rows not
+    mentioned are deleted. Returns True if anything changed.
+    """
+    existing = {item.id: item for item in invoice.line_items if item.id is not None}
+    kept, changed = set(), False
+    for values in items:
+        item_id = values.get('id')
+        item = existing.get(item_id) if item_id not in kept else None
+        item_total = values['quantity'] * values['unit_price']
+        if item is None:
+            invoice.line_items.append(LineItem(
+                description=values['description'],
+                quantity=values['quantity'],
+                unit_price=values['unit_price'],
+                total=item_total,
+            ))
+            changed = True
+            continue
+        kept.add(item_id)
+        for name, value in (('description', values['description']), ('quantity', values['quantity']),
+                            ('unit_price', values['unit_price']), ('total', item_total)):
+            if getattr(item, name) != value:
+                setattr(item, name, value)
+                changed = True
+
+    for item_id, item in existing.items():
+        if item_id not in kept:
+            invoice.line_items.remove(item)
+            changed = True
+
+    total = sum(item.total for item in invoice.line_items)
+    if invoice.total_amount != total:
+        invoice.total_amount = total
+    if changed:
+        touch(invoice)
+    return changed
+
+
+def form_line_items(form):
+    return [
+        {
+            'id': entry.form.id.data,
+            'description': entry.form.description.data,
+            'quantity': entry.form.quantity.data,
+            'unit_price': entry.form.unit_price.data,
+        }
+        for entry in form.line_items.entries
+    ]
+
+
+def invoices_changed(user_id, invoice_ids=()):
+    """Call after commit: drop cached PDFs and dashboard counts."""
+    for invoice_id in invoice_ids:
+        pdf_cache.invalidate(invoice_id)
+    invalidate_user_stats(user_id)
+
+
+def client_details_changed(client_id):
+    """Bump the version of every invoice showing this client's name or company.
+
+    One UPDATE, so cached pages and HTTP validators for those invoices go stale.
+    """
+    db.session.execute(update(Invoice).where(Invoice.client_id == client_id)
+                       .values(version=Invoice.version + 1)
+                       .execution_options(synchronize_session=False))
@@ -0,0 +1,70 @@
+import click
+
+from app import status
+from app.importer import import_invoices
+from app.pdf import pdf_cache, pdf_renderer, pdf_stylesheet
+from . import invoices
+from .export import invoice_filters, pdf_documents, zip_stream
+
+
+@invoices.cli.command('import')
+@click.argument('csv_file', type=click.File('rb'))
+@click.option('--user-id', type=int, required=True, help='Owner of the imported invoices.')
+@click.option('--batch-size', type=int, default=500, show_default=True, help='Invoices per transaction.')
+def import_command(csv_file, user_id, batch_size):
+    """Bulk import invoices (one row per line item) from a CSV file."""
+    report = import_invoices(csv_file, user_id, batch_size=batch_size)
+    for line, message in report.errors:
+        click.echo(f'line {line}: {message}', err=True)
+    click.echo(f'{report.rows} row(s) read, {report.created} invoice(s) created, {report.failed} rejected.')
+
+
+@invoices.cli.command('mark-overdue')
+@click.option('--user-id', type=int, default=None, help='Only this user\'s invoices (default: everyone).')
+def mark_overdue_command(user_id):
+    """Move unpaid invoices past their due date to the overdue status."""
+    moved = status.mark_overdue(user_id=user_id)
+    click.echo(f'{sum(moved.values())} invoice(s) marked overdue for {len(moved)} user(s).')
+
+
+@invoices.cli.command('export-pdf')
+@click.argument('output', type=click.Path(dir_okay=False, writable=True))
+@click.option('--user-id', type=int, required=True, help='Owner of the invoices.')
+@click.option('--from', 'date_from', type=click.DateTime(['%Y-%m-%d']), help='Issued on or after this date.')
+@click.option('--to', 'date_to', type=click.DateTime(['%Y-%m-%d']), help='Issued on or before this date.')
+@click.option('--status', 'status_', type=click.Choice(['all', status.PAID, status.UNPAID, status.OVERDUE]),
+              default='all', show_default=True)
+@click.option('--client-id', type=int, default=None, help='Only this client\'s invoices.')
+@click.option('--format', 'fmt', type=click.Choice(['pdf', 'zip']), default=None,
+              help='One combined PDF or a ZIP of PDFs (default: from OUTPUT\'s extension).')
+def export_pdf_command(output, user_id, date_from, date_to, status_, client_id, fmt):
+    """Render the matching invoices into one PDF, or a ZIP with a PDF per invoice."""
+    fmt = fmt or ('zip' if output.lower().endswith('.zip') else 'pdf')
+    criteria = invoice_filters(user_id, {
+        'status': status_,
+        'from': date_from and date_from.date().isoformat(),
+        'to': date_to and date_to.date().isoformat(),
+        'client': client_id,
+    })
+    css = pdf_stylesheet()
+    documents = pdf_documents(criteria, css)
+    if fmt == 'pdf':
+        htmls = [html for _, _, html in documents]
+        if not htmls:
+            raise click.ClickException('No invoices match these filters.')
+        with open(output, 'wb') as fh:
+            fh.write(pdf_renderer.render_combined(htmls, css))
+        count = len(htmls)
+    else:
+        count = 0
+
+        def counted(rendered):
+            nonlocal count
+            for entry in rendered:
+                count += 1
+                yield entry
+
+        with open(output, 'wb') as fh:
+            for chunk in zip_stream(counted(pdf_renderer.render_many(documents, css, pdf_cache.backend))):
+                fh.write(chunk)
+    click.echo(f'{count} invoice(s) written to {output}.')
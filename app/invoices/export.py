@@ -0,0 +1,172 @@
+# app/invoices/export.py
+
+import csv
+import io
+import json
+import zipfile
+from datetime import date
+
+from flask import abort, render_template
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload, selectinload
+
+from app import db
+from app.models import Client, Invoice, LineItem
+from app.pdf import cache_key
+from app.status import OUTSTANDING, OVERDUE, PAID, UNPAID
+
+CSV_COLUMNS = (
+    'invoice_id', 'issue_date', 'due_date', 'status', 'total_amount',
+    'client_id', 'client_name', 'client_email', 'client_company',
+    'line_item_id', 'description', 'quantity', 'unit_price', 'line_total',
+)
+
+
+def _parse_date(value, name):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        abort(400, description=f'{name} must be a YYYY-MM-DD date.')
+
+
+def invoice_filters(user_id, args):
+    """SQL criteria for the ?status= / ?from= / ?to= / ?client= filters shared by the list and exports."""
+    criteria = [Invoice.user_id == user_id]
+    status = args.get('status', 'all')
+    if status == UNPAID:
+        # Overdue invoices are still unpaid, as on the dashboard and reports.
+        criteria.append(Invoice.status.in_(OUTSTANDING))
+    elif status in (PAID, OVERDUE):
+        criteria.append(Invoice.status == status)
+    if args.get('from'):
+        criteria.append(Invoice.issue_date >= _parse_date(args['from'], 'from'))
+    if args.get('to'):
+        criteria.append(Invoice.issue_date <= _parse_date(args['to'], 'to'))
+    if args.get('client'):
+        try:
+            criteria.append(Invoice.client_id == int(args['client']))
+        except ValueError:
+            abort(400, description='client must be a client id.')
+    return criteria
+
+
+def export_rows(criteria, batch_size=1000):
+    """One row per line item, streamed from a server-side cursor in ``batch_size`` chunks."""
+    stmt = (
+        select(
+            Invoice.id, Invoice.issue_date, Invoice.due_date, Invoice.status, Invoice.total_amount,
+            Client.id, Client.name, Client.email, Client.company,
+            LineItem.id, LineItem.description, LineItem.quantity, LineItem.unit_price, LineItem.total,
+        )
+        .join(Client, Invoice.client_id == Client.id)
+        .outerjoin(LineItem, LineItem.invoice_id == Invoice.id)
+        .where(*criteria)
+        .order_by(Invoice.id, LineItem.id)
+        .execution_options(yield_per=batch_size)
+    )
+    yield from db.session.execute(stmt)
+
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+def csv_stream(rows, flush_every=500):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for n, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if n % flush_every == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def jsonl_stream(rows, flush_every=200):
+    """One JSON object per invoice with its line items nested (rows arrive grouped by invoice)."""
+    chunk, current = [], None
+
+    def dump(invoice):
+        return json.dumps(invoice, separators=(',', ':')) + '\n'
+
+    for row in rows:
+        if current is None or current['id'] != row[0]:
+            if current is not None:
+                chunk.append(dump(current))
+                if len(chunk) >= flush_every:
+                    yield ''.join(chunk)
+                    chunk = []
+            current = {
+                'id': row[0],
+                'issue_date': _iso(row[1]),
+                'due_date': _iso(row[2]),
+                'status': row[3],
+                'total_amount': row[4],
+                'client': {'id': row[5], 'name': row[6], 'email': row[7], 'company': row[8]},
+                'line_items': [],
+            }
+        if row[9] is not None:
+            current['line_items'].append({
+                'id': row[9], 'description': row[10], 'quantity': row[11],
+                'unit_price': row[12], 'total': row[13],
+            })
+    if current is not None:
+        chunk.append(dump(current))
+    if chunk:
+        yield ''.join(chunk)
+
+
+def pdf_documents(criteria, stylesheet, batch_size=50):
+    """``((invoice id, issue date), cache key, PDF html)`` per matching invoice, oldest first.
+
+    Invoices are loaded ``batch_size`` at a time and rendered to HTML only as
+    the consumer asks for them.
+    """
+    query = (
+        Invoice.query
+        .options(joinedload(Invoice.client), selectinload(Invoice.line_items))
+        .filter(*criteria)
+        .order_by(Invoice.issue_date, Invoice.id)
+        .yield_per(batch_size)
+    )
+    for invoice in query:
+        html = render_template('pdf_template.html', invoice=invoice)
+        yield (invoice.id, invoice.issue_date), cache_key(invoice.id, html, stylesheet), html
+
+
+class _ZipSink:
+    """Write-only file for ZipFile; it can't seek, so entries get data descriptors and nothing is rewritten."""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def zip_stream(rendered):
+    """A ZIP of the ``((invoice id, issue date), pdf)`` pairs, each entry sent once it is written."""
+    sink = _ZipSink()
+    # PDFs are compressed already; deflating them again costs CPU for nothing.
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_STORED) as archive:
+        for (invoice_id, issued), pdf in rendered:
+            entry = zipfile.ZipInfo(f'invoice-{invoice_id}.pdf', (issued.year, issued.month, issued.day, 0, 0, 0))
+            archive.writestr(entry, pdf)
+            yield sink.drain()
+    yield sink.drain()
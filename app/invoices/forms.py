@@ -1,18 +1,68 @@
+from flask import url_for
+from flask_login import current_user
 from flask_wtf import FlaskForm
-from wtforms import StringField, IntegerField, FloatField, FieldList, FormField, SubmitField, DateField, SelectField
-from wtforms.validators import DataRequired, Optional, NumberRange
+from markupsafe import Markup
+from wtforms import HiddenField, StringField, IntegerField, FloatField, FieldList, FormField, SubmitField, DateField
+from wtforms.validators import DataRequired, Optional, NumberRange, ValidationError
+
+from app import db
+from app.models import Client
+
+
+class ClientPickerWidget:
+    """A search box backed by /clients/search.json (static/js/client_picker.js) and a hidden id."""
+
+    def __call__(self, field, **kwargs):
+        css_class = kwargs.pop('class', 'form-control')
+        client = field.client()
+        return Markup(
+            '<div class="client-picker" data-search-url="{url}">'
+            '<input type="search" id="{id}-search" class="{css_class} client-picker-input" value="{label}" '
+            'placeholder="Search clients by name, company or email" autocomplete="off">'
+            '<input type="hidden" id="{id}" name="{name}" value="{value}">'
+            '<div class="client-picker-results" role="listbox"></div>'
+            '</div>'
+        ).format(
+            url=url_for('clients.search_clients'),
+            id=field.id,
+            name=field.name,
+            css_class=css_class,
+            label=client.name if client else '',
+            value=field.data if field.data is not None else '',
+        )
+
+
+class ClientField(IntegerField):
+    """Client id checked against the current user's clients with a single lookup,
+    rather than a SelectField holding every client they have."""
+
+    widget = ClientPickerWidget()
+
+    def client(self):
+        if self.data is None:
+            return None
+        if getattr(self, '_client', None) is None or self._client.id != self.data:
+            self._client = db.session.scalar(
+                db.select(Client).where(Client.id == self.data, Client.user_id == current_user.id))
+        return self._client
+
+    def pre_validate(self, form):
+        if self.data is not None and self.client() is None:
+            raise ValidationError('Choose one of your clients.')
 
 class LineItemForm(FlaskForm):
     # ✅ Disable CSRF for nested form only
     class Meta:
         csrf = False
 
+    # Id of the LineItem being edited; blank for a new row.
+    id = HiddenField(filters=[lambda value: int(value) if value and str(value).isdigit() else None])
     description = StringField('Description', validators=[DataRequired()])
     quantity = IntegerField('Quantity', validators=[DataRequired(), NumberRange(min=1)])
     unit_price = FloatField('Unit Price', validators=[DataRequired(), NumberRange(min=0.0)])
 
 class InvoiceForm(FlaskForm):
-    client_id = SelectField('Client', coerce=int, validators=[DataRequired()])
+    client_id = ClientField('Client', validators=[DataRequired(message='Choose a client.')])
     issue_date = DateField('Issue Date', validators=[DataRequired()])
     due_date = DateField('Due Date', validators=[DataRequired()])
     line_items = FieldList(FormField(LineItemForm), min_entries=1)
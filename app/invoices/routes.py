@@ -1,38 +1,34 @@
-from flask import render_template, redirect, url_for, flash, request, make_response
+from flask import render_template, redirect, url_for, flash, request, make_response, abort, jsonify, Response, stream_with_context
 from flask_login import login_required, current_user
-from . import invoices
+from . import caching, invoices
 from .forms import InvoiceForm
-from app import db, mail
-from app.models import Client, Invoice, LineItem
-from datetime import datetime
-from weasyprint import HTML
-from flask_mail import Message
+from .changes import set_line_items, form_line_items, invoices_changed
+from .export import invoice_filters, export_rows, csv_stream, jsonl_stream, pdf_documents, zip_stream
+from app.clients.forms import CSVImportForm
+from app.importer import import_invoices, INVOICE_COLUMNS
+from app import db, rollup, status
+from app.models import Invoice
+from app.pagination import KeysetPage
+from app.rendering import render_list
+from app.replicas import read_only
+from app.pdf import pdf_cache, pdf_renderer, pdf_stylesheet, submit_invoice_pdf, RenderQueueFull, RenderTimeout
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload, selectinload
+import logging
 import os
-from threading import Thread
+import re
 from flask import current_app
-# Async email sender
-
-def send_async_email(app, msg):
-    with app.app_context():
-        mail.send(msg)
-
-def send_email(subject, sender, recipients, text_body, html_body, attachments=None, sync=False):
-    msg = Message(subject, sender=sender, recipients=recipients)
-    msg.body = text_body
-    msg.html = html_body
-    if attachments:
-        for attachment in attachments:
-            msg.attach(*attachment)
-    if sync:
-        mail.send(msg)
-    else:
-        Thread(target=send_async_email, args=(current_app._get_current_object(), msg)).start()
+from app.email import send_email, MailQueueFull
+
+logger = logging.getLogger(__name__)
+
+# The hash half of a job id (see app.pdf.cache_key)
+JOB_DIGEST = re.compile(r'[0-9a-f]{32}')
 
 @invoices.route('/create', methods=['GET', 'POST'])
 @login_required
 def create_invoice():
     form = InvoiceForm()
-    form.client_id.choices = [(client.id, client.name) for client in Client.query.filter_by(user_id=current_user.id)]
 
     if form.validate_on_submit():
         invoice = Invoice(
@@ -42,57 +38,113 @@ def create_invoice():
             due_date=form.due_date.data
         )
 
-        total = 0
-        for item_form in form.line_items.entries:
-            quantity = item_form.form.quantity.data
-            unit_price = item_form.form.unit_price.data
-            item_total = quantity * unit_price
-            total += item_total
-
-            line_item = LineItem(
-                description=item_form.form.description.data,
-                quantity=quantity,
-                unit_price=unit_price,
-                total=item_total
-            )
-            invoice.line_items.append(line_item)
-
-        invoice.total_amount = total
+        set_line_items(invoice, form_line_items(form))
+        status.refresh(invoice)
         db.session.add(invoice)
+        rollup.apply_invoice_change(None, rollup.snapshot(invoice))
         db.session.commit()
+        invoices_changed(current_user.id)
         flash('Invoice created successfully!', 'success')
         return redirect(url_for('invoices.create_invoice'))
 
     if request.method == 'POST' and not form.validate():
         flash('Please correct the errors in the form.', 'danger')
-        print("Form Errors:", form.errors)
+        logger.info('Invalid invoice form: %s', form.errors)
 
     return render_template('create_invoice.html', form=form)
 
 
+@invoices.route('/import', methods=['GET', 'POST'])
+@login_required
+def import_invoices_csv():
+    form = CSVImportForm()
+    report = None
+    if form.validate_on_submit():
+        report = import_invoices(form.file.data.stream, current_user.id)
+        category = 'warning' if report.failed else 'success'
+        flash(f'Imported {report.created} invoice(s), {report.failed} rejected.', category)
+    return render_template('import.html', form=form, report=report, title='Import Invoices',
+                           columns=INVOICE_COLUMNS, back_url=url_for('invoices.list_invoices'))
+
+
 @invoices.route('/list')
 @login_required
+@read_only
 def list_invoices():
     status_filter = request.args.get('status', 'all')
-    query = Invoice.query.filter_by(user_id=current_user.id)
+    query = Invoice.query.filter(*invoice_filters(current_user.id, request.args))
+
+    per_page = request.args.get('per_page', current_app.config['INVOICES_PER_PAGE'], type=int)
+    per_page = max(1, min(per_page, current_app.config['MAX_PER_PAGE']))
+
+    page = KeysetPage(
+        query.options(joinedload(Invoice.client)),
+        [Invoice.due_date, Invoice.id],
+        per_page,
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        lazy=True,
+    )
+    return render_list('invoice_list.html', invoices=page, page=page,
+                           status=status_filter, per_page=per_page,
+                           date_from=request.args.get('from'), date_to=request.args.get('to'))
+
+
+@invoices.route('/export.<fmt>')
+@login_required
+def export_invoices(fmt):
+    criteria = invoice_filters(current_user.id, request.args)
+    if fmt in ('pdf', 'zip'):
+        return export_pdfs(fmt, criteria)
+    if fmt == 'csv':
+        stream, mimetype = csv_stream, 'text/csv'
+    elif fmt == 'jsonl':
+        stream, mimetype = jsonl_stream, 'application/x-ndjson'
+    else:
+        abort(404)
+    response = Response(stream_with_context(stream(export_rows(criteria))), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=invoices.{fmt}'
+    return response
 
-    if status_filter == 'paid':
-        query = query.filter_by(status='paid')
-    elif status_filter == 'unpaid':
-        query = query.filter_by(status='unpaid')
-    elif status_filter == 'overdue':
-        query = query.filter(Invoice.due_date < datetime.today(), Invoice.status == 'unpaid')
 
-    invoices_list = query.order_by(Invoice.due_date.desc()).all()
-    return render_template('invoice_list.html', invoices=invoices_list, status=status_filter)
+def export_pdfs(fmt, criteria):
+    """Every matching invoice as one combined PDF, or as a ZIP of PDFs streamed as they render."""
+    count = db.session.query(func.count(Invoice.id)).filter(*criteria).scalar()
+    limit = current_app.config['PDF_EXPORT_MAX']
+    if count > limit:
+        abort(400, description=f'{count} invoices match; narrow the filters to at most {limit} per export.')
+    timeout = current_app.config['PDF_EXPORT_TIMEOUT']
+    css = pdf_stylesheet()
+    documents = pdf_documents(criteria, css)
+    if fmt == 'pdf':
+        if not count:
+            abort(404, description='No invoices match these filters.')
+        try:
+            pdf = pdf_renderer.render_combined([html for _, _, html in documents], css, timeout=timeout)
+        except (RenderQueueFull, RenderTimeout):
+            return render_busy()
+        response = make_response(pdf)
+        response.mimetype = 'application/pdf'
+    else:
+        # Checked up front: once the ZIP is streaming, a full queue or a
+        # timeout can only cut it short.
+        if not pdf_renderer.has_capacity():
+            return render_busy()
+        rendered = pdf_renderer.render_many(documents, css, pdf_cache.backend, timeout=timeout)
+        response = Response(stream_with_context(zip_stream(rendered)), mimetype='application/zip')
+    response.headers['Content-Disposition'] = f'attachment; filename=invoices.{fmt}'
+    return response
 
 
 @invoices.route('/mark-paid/<int:invoice_id>', methods=['POST'])
 @login_required
 def mark_invoice_paid(invoice_id):
     invoice = Invoice.query.filter_by(id=invoice_id, user_id=current_user.id).first_or_404()
-    invoice.status = 'paid'
+    before = rollup.snapshot(invoice)
+    invoice.status = status.PAID
+    rollup.apply_invoice_change(before, rollup.snapshot(invoice))
     db.session.commit()
+    invoices_changed(current_user.id, [invoice.id])
     flash('Invoice marked as paid.', 'success')
     return redirect(url_for('invoices.list_invoices'))
 
@@ -100,20 +152,94 @@ def mark_invoice_paid(invoice_id):
 @invoices.route('/view/<int:invoice_id>')
 @login_required
 def view_invoice(invoice_id):
-    invoice = Invoice.query.filter_by(id=invoice_id, user_id=current_user.id).first_or_404()
-    return render_template('view_invoice.html', invoice=invoice)
+    version, etag, last_modified = caching.validators(
+        invoice_id, current_user.id, 'base.html', 'view_invoice.html', 'view_invoice_body.html',
+        vary=current_user.name)
+    if caching.not_modified(etag, last_modified):
+        return caching.validated(make_response('', 304), etag, last_modified)
+
+    def load():
+        return Invoice.query.options(joinedload(Invoice.client), selectinload(Invoice.line_items)) \
+            .filter_by(id=invoice_id, user_id=current_user.id).first_or_404()
+
+    body = caching.invoice_body(invoice_id, version, load)
+    response = make_response(render_template('view_invoice.html', invoice_id=invoice_id, invoice_body=body))
+    return caching.validated(response, etag, last_modified)
+
+
+def pdf_response(pdf, invoice_id):
+    response = make_response(pdf)
+    response.headers['Content-Type'] = 'application/pdf'
+    response.headers['Content-Disposition'] = f'inline; filename=Your_Invoice_{invoice_id}.pdf'
+    return response
+
+
+def render_busy():
+    response = jsonify(error='PDF renderer is busy, try again shortly.')
+    response.status_code = 503
+    response.headers['Retry-After'] = '5'
+    return response
+
+
+def pdf_job_response(job_id, status):
+    status_url = url_for('invoices.pdf_job', job_id=job_id)
+    response = jsonify(job_id=job_id, status=status, status_url=status_url)
+    response.status_code = 202
+    response.headers['Location'] = status_url
+    response.headers['Retry-After'] = '1'
+    return response
+
+
+def pdf_job_failed(job_id):
+    response = jsonify(job_id=job_id, status='failed')
+    response.status_code = 500
+    return response
 
 
 @invoices.route('/pdf/<int:invoice_id>')
 @login_required
 def download_pdf(invoice_id):
+    _, etag, last_modified = caching.validators(invoice_id, current_user.id, 'pdf_template.html', 'pdf_invoice.css')
+    if caching.not_modified(etag, last_modified):
+        return caching.validated(make_response('', 304), etag, last_modified)
+
     invoice = Invoice.query.filter_by(id=invoice_id, user_id=current_user.id).first_or_404()
-    rendered = render_template('pdf_template.html', invoice=invoice)
-    pdf = HTML(string=rendered).write_pdf()
-    response = make_response(pdf)
-    response.headers['Content-Type'] = 'application/pdf'
-    response.headers['Content-Disposition'] = f'inline; filename=Your_Invoice_{invoice.id}.pdf'
-    return response
+    try:
+        pdf, job = submit_invoice_pdf(invoice)
+    except RenderQueueFull:
+        return render_busy()
+    if pdf is None:
+        try:
+            pdf = job.wait(current_app.config['PDF_RENDER_WAIT'])
+        except Exception:
+            logger.exception('PDF render %s failed', job.key)
+            return pdf_job_failed(job.key)
+        if pdf is None:
+            return pdf_job_response(job.key, job.status)
+    return caching.validated(pdf_response(pdf, invoice.id), etag, last_modified)
+
+
+@invoices.route('/pdf/jobs/<job_id>')
+@login_required
+def pdf_job(job_id):
+    invoice_id, _, digest = job_id.partition('-')
+    if not invoice_id.isdigit() or not JOB_DIGEST.fullmatch(digest):
+        abort(404)
+    Invoice.query.filter_by(id=int(invoice_id), user_id=current_user.id).first_or_404()
+
+    pdf = pdf_cache.get(job_id)
+    if pdf is not None:
+        return pdf_response(pdf, invoice_id)
+    job = pdf_renderer.get(job_id)
+    if job is None:
+        # Submitted in another worker process: its PDF reaches the shared
+        # cache when it's done, so keep the client polling.
+        return pdf_job_response(job_id, 'pending')
+    if job.status == 'failed':
+        return pdf_job_failed(job_id)
+    if job.status == 'done':
+        return pdf_response(job.wait(), invoice_id)
+    return pdf_job_response(job.key, job.status)
 
 
 @invoices.route('/email/<int:invoice_id>', methods=['POST'])
@@ -127,20 +253,38 @@ def email_invoice(invoice_id):
 
     html_body = render_template('email_body.html', invoice=invoice)
     text_body = render_template('email_body.txt', invoice=invoice)
-    rendered_pdf = render_template('pdf_template.html', invoice=invoice)
-    pdf = HTML(string=rendered_pdf).write_pdf()
-
-    send_email(
-        subject=f"Invoice #{invoice.id}",
-        sender=os.getenv('MAIL_USERNAME'),
-        recipients=[invoice.client.email],
-        text_body=text_body,
-        html_body=html_body,
-        attachments=[(f"Your_Invoice_{invoice.id}.pdf", "application/pdf", pdf)]
-    )
+    back = redirect(url_for('invoices.view_invoice', invoice_id=invoice.id))
+    try:
+        pdf, job = submit_invoice_pdf(invoice)
+        if pdf is None:
+            pdf = job.wait(current_app.config['PDF_RENDER_WAIT'])
+    except RenderQueueFull:
+        flash("PDF renderer is busy, please try again in a moment.", "danger")
+        return back
+    except Exception:
+        logger.exception('PDF render for invoice %s failed', invoice.id)
+        flash("The invoice PDF could not be rendered, so nothing was sent.", "danger")
+        return back
+    if pdf is None:
+        # The render carries on; sending again picks it up from the cache.
+        flash("The invoice PDF is still rendering, please send it again in a moment.", "warning")
+        return back
+
+    try:
+        send_email(
+            subject=f"Invoice #{invoice.id}",
+            sender=os.getenv('MAIL_USERNAME'),
+            recipients=[invoice.client.email],
+            text_body=text_body,
+            html_body=html_body,
+            attachments=[(f"Your_Invoice_{invoice.id}.pdf", "application/pdf", pdf)]
+        )
+    except MailQueueFull:
+        flash("Too much mail is waiting to go out, please try again in a moment.", "danger")
+        return back
 
-    flash("Invoice emailed successfully.", "success")
-    return redirect(url_for('invoices.view_invoice', invoice_id=invoice.id))
+    flash(f"Invoice queued for email to {invoice.client.email}.", "success")
+    return back
 
 
 @invoices.route('/edit/<int:invoice_id>', methods=['GET', 'POST'])
@@ -153,30 +297,18 @@ def edit_invoice(invoice_id):
         return redirect(url_for('invoices.list_invoices'))
 
     form = InvoiceForm(obj=invoice)
-    form.client_id.choices = [(client.id, client.name) for client in Client.query.filter_by(user_id=current_user.id)]
 
     if request.method == 'POST' and form.validate_on_submit():
+        before = rollup.snapshot(invoice)
         invoice.client_id = form.client_id.data
         invoice.issue_date = form.issue_date.data
         invoice.due_date = form.due_date.data
 
-        invoice.line_items.clear()
-        total = 0
-        for item_form in form.line_items.entries:
-            quantity = item_form.form.quantity.data
-            unit_price = item_form.form.unit_price.data
-            item_total = quantity * unit_price
-            total += item_total
-            line_item = LineItem(
-                description=item_form.form.description.data,
-                quantity=quantity,
-                unit_price=unit_price,
-                total=item_total
-            )
-            invoice.line_items.append(line_item)
-
-        invoice.total_amount = total
+        set_line_items(invoice, form_line_items(form))
+        status.refresh(invoice)
+        rollup.apply_invoice_change(before, rollup.snapshot(invoice))
         db.session.commit()
+        invoices_changed(current_user.id, [invoice.id])
         flash('Invoice updated successfully!', 'success')
         return redirect(url_for('invoices.view_invoice', invoice_id=invoice.id))
 
@@ -192,7 +324,10 @@ def delete_invoice(invoice_id):
         flash('Unauthorized', 'danger')
         return redirect(url_for('invoices.list_invoices'))
 
+    before = rollup.snapshot(invoice)
     db.session.delete(invoice)
+    rollup.apply_invoice_change(before, None)
     db.session.commit()
+    invoices_changed(current_user.id, [invoice_id])
     flash('Invoice deleted!', 'success')
     return redirect(url_for('invoices.list_invoices'))
\ No newline at end of file
@@ -0,0 +1,26 @@
+# app/metrics.py
+
+from flask import jsonify
+from flask_login import login_required
+
+_providers = {}
+
+
+def register(name, provider):
+    """Expose ``provider()`` (a dict of counters) under ``name`` on /stats."""
+    _providers[name] = provider
+
+
+def collect():
+    return {name: provider() for name, provider in _providers.items()}
+
+
+@login_required
+def stats():
+    return jsonify(collect())
+
+
+def init_app(app):
+    # The counters are per process, not per tenant, so the route is opt-in.
+    if app.config['STATS_ENABLED']:
+        app.add_url_rule('/stats', 'stats', stats)
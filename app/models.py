@@ -1,12 +1,14 @@
+from datetime import datetime
 from . import db
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
     name = db.Column(db.String(100), nullable=False)
-    password_hash = db.Column(db.String(128), nullable=False)
+    password_hash = db.Column(db.String(255), nullable=False)
     #relationship with verify code for user
     is_verified = db.Column(db.Boolean, default=False)
     verification_code = db.Column(db.String(6), nullable=True)
@@ -19,10 +21,18 @@ class User(UserMixin, db.Model):
     invoices = db.relationship('Invoice', backref='user', lazy=True)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password, method='pbkdf2:sha256')
+        from app.passwords import hasher
+        self.password_hash = hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        """Verify ``password``, re-hashing it if the stored hash uses old parameters."""
+        from app.passwords import hasher
+        if not hasher.verify(self.password_hash, password):
+            return False
+        if hasher.needs_rehash(self.password_hash):
+            self.password_hash = hasher.hash(password)
+            hasher.upgraded += 1
+        return True
 
 class Client(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -34,6 +44,18 @@ class Client(db.Model):
     
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
+    # Denormalized from the client's invoices by app/rollup.py; never set directly.
+    outstanding_balance = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
+    invoice_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    last_invoice_date = db.Column(db.Date, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_client_user_id_name', 'user_id', 'name'),
+        # client list sorted by balance / invoice count
+        db.Index('ix_client_user_id_outstanding_balance_id', 'user_id', 'outstanding_balance', 'id'),
+        db.Index('ix_client_user_id_invoice_count_id', 'user_id', 'invoice_count', 'id'),
+    )
+
 
 class Invoice(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -41,17 +63,60 @@ class Invoice(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     issue_date = db.Column(db.Date, nullable=False)
     due_date = db.Column(db.Date, nullable=False)
-    status = db.Column(db.String(20), default='unpaid')  # unpaid / paid
+    status = db.Column(db.String(20), default='unpaid')  # unpaid / overdue / paid, see app/status.py
     total_amount = db.Column(db.Float, default=0.0)
+    last_reminded_at = db.Column(db.DateTime, nullable=True)
+    # Bumped on every write, including line-item-only edits (see invoices/changes.py)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Incremented in SQL on every UPDATE of the row (see _bump_version); the
+    # HTTP validators and the rendered-page cache are keyed on it.
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
 
     client = db.relationship('Client', backref='invoices', lazy=True)
     line_items = db.relationship('LineItem', backref='invoice', cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # list_invoices: keyset on (due_date, id) per tenant
+        db.Index('ix_invoice_user_id_due_date_id', 'user_id', 'due_date', 'id'),
+        # status filters, paid counts and reports
+        db.Index('ix_invoice_user_id_status_due_date', 'user_id', 'status', 'due_date'),
+        # dashboard recent invoices and monthly reports
+        db.Index('ix_invoice_user_id_issue_date', 'user_id', 'issue_date'),
+        db.Index('ix_invoice_client_id', 'client_id'),
+        # API listing / incremental sync
+        db.Index('ix_invoice_user_id_updated_at_id', 'user_id', 'updated_at', 'id'),
+        # mark_overdue() only ever touches unpaid rows, across all tenants
+        db.Index('ix_invoice_unpaid_due_date', 'due_date',
+                 postgresql_where=db.text("status = 'unpaid'"),
+                 sqlite_where=db.text("status = 'unpaid'")),
+    )
+
+
+@event.listens_for(Invoice, 'before_update')
+def _bump_version(mapper, connection, target):
+    # version + 1 rather than a value computed here, so concurrent writers
+    # can't both hand out the same version.
+    if object_session(target).is_modified(target, include_collections=False):
+        target.version = Invoice.version + 1
+
 
 class LineItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    invoice_id = db.Column(db.Integer, db.ForeignKey('invoice.id'), nullable=False)
+    invoice_id = db.Column(db.Integer, db.ForeignKey('invoice.id'), nullable=False, index=True)
     description = db.Column(db.String(200), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
     unit_price = db.Column(db.Float, nullable=False)
-    total = db.Column(db.Float, nullable=False)
\ No newline at end of file
+    total = db.Column(db.Float, nullable=False)
+
+
+class MonthlyRevenue(db.Model):
+    # Per-user, per-month rollup of invoices by issue date; see app/rollup.py.
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    invoice_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    revenue = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
+    paid_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    paid_revenue = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
+    unpaid_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    overdue_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
@@ -0,0 +1,137 @@
+# app/pagination.py
+
+import base64
+import json
+from datetime import date, datetime
+
+from flask import abort
+from sqlalchemy import tuple_
+
+
+def encode_cursor(values):
+    payload = json.dumps([v.isoformat() if isinstance(v, (date, datetime)) else v for v in values])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, columns):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(raw, list) or len(raw) != len(columns):
+            raise ValueError(token)
+        values = []
+        for column, value in zip(columns, raw):
+            python_type = column.type.python_type
+            if python_type in (date, datetime):
+                value = python_type.fromisoformat(value)
+            elif value is not None:
+                value = python_type(value)
+            values.append(value)
+        return values
+    except (ValueError, TypeError, NotImplementedError):
+        abort(400, description='Invalid pagination cursor.')
+
+
+class KeysetPage:
+    """One page of a query ordered by ``columns`` (the last one must be unique).
+
+    ``after`` / ``before`` are opaque cursors taken from a previous page's
+    ``next_cursor`` / ``prev_cursor``; the query never uses OFFSET, so every
+    page costs the same no matter how deep into the result set it is.
+
+    With ``lazy``, rows are fetched in batches as the page is iterated, so a
+    streamed template can send the first rows before the last are loaded.
+    Pages walked backwards still load at once, as they have to be reversed.
+    """
+
+    def __init__(self, query, columns, per_page, after=None, before=None, descending=True, lazy=False,
+                 batch_size=20):
+        self.columns = columns
+        self.per_page = per_page
+        self.descending = descending
+        self._backwards = backwards = before is not None and after is None
+        cursor = before if backwards else after
+        self._cursor = cursor
+
+        # Walking backwards flips both the comparison and the sort order.
+        forward_desc = descending != backwards
+        key = tuple_(*columns)
+        if cursor is not None:
+            values = tuple(decode_cursor(cursor, columns))
+            query = query.filter(key < values if forward_desc else key > values)
+        order = [c.desc() if forward_desc else c.asc() for c in columns]
+        query = query.order_by(*order).limit(per_page + 1)
+
+        self.items = []
+        self._pending = None
+        if lazy and not backwards:
+            self._pending = query.session.scalars(query.statement, execution_options={'yield_per': batch_size})
+            return
+
+        rows = query.all()
+        self._has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        if backwards:
+            rows.reverse()
+        self.items = rows
+
+    def _fill(self, count=None):
+        """Pull rows from a lazy page's cursor until ``items`` holds ``count`` of them (all when None)."""
+        while self._pending is not None and (count is None or len(self.items) < count):
+            row = next(self._pending, None)
+            if row is None or len(self.items) == self.per_page:
+                self._has_more = row is not None
+                self._pending.close()
+                self._pending = None
+            else:
+                self.items.append(row)
+
+    @property
+    def has_next(self):
+        if self._backwards:
+            return True
+        self._fill()
+        return self._has_more
+
+    @property
+    def has_prev(self):
+        if self._backwards:
+            return self._has_more
+        return self._cursor is not None
+
+    def __iter__(self):
+        if self._pending is None:
+            return iter(self.items)
+        return self._iter_lazy()
+
+    def _iter_lazy(self):
+        index = 0
+        while True:
+            self._fill(index + 1)
+            if index == len(self.items):
+                return
+            yield self.items[index]
+            index += 1
+
+    def __bool__(self):
+        self._fill(1)
+        return bool(self.items)
+
+    def __len__(self):
+        self._fill()
+        return len(self.items)
+
+    def _key(self, item):
+        return [getattr(item, c.key) for c in self.columns]
+
+    @property
+    def next_cursor(self):
+        if self.has_next and self.items:
+            return encode_cursor(self._key(self.items[-1]))
+        return None
+
+    @property
+    def prev_cursor(self):
+        if self.has_prev and self.items:
+            return encode_cursor(self._key(self.items[0]))
+        return None
@@ -0,0 +1,114 @@
+# app/passwords.py
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from app import metrics
+
+
+class HasherBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    """Runs password hashing on a small fixed pool of threads.
+
+    hashlib's PBKDF2 and scrypt release the GIL, so the pool caps how many
+    cores a login storm can burn while other requests keep being served. At
+    most PASSWORD_HASH_WORKERS hashes run at once and PASSWORD_HASH_MAX_QUEUE
+    more may wait; beyond that callers get HasherBusy (a 503) immediately
+    instead of piling up behind the pool.
+    """
+
+    def __init__(self):
+        self.method = 'pbkdf2:sha256:1000000'
+        self.salt_length = 16
+        self._executor = None
+        self._slots = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=1000)
+        self.hashed = 0
+        self.verified = 0
+        self.rejected = 0
+        self.upgraded = 0
+
+    def init_app(self, app):
+        self.method = app.config['PASSWORD_HASH_METHOD']
+        self.salt_length = app.config['PASSWORD_SALT_LENGTH']
+        self.workers = app.config['PASSWORD_HASH_WORKERS']
+        self.max_queue = app.config['PASSWORD_HASH_MAX_QUEUE']
+        self.timeout = app.config['PASSWORD_HASH_TIMEOUT']
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_queue)
+        app.extensions['password_hasher'] = self
+        app.register_error_handler(HasherBusy, hasher_busy)
+        metrics.register('password_hasher', self.stats)
+
+    def _pool(self):
+        # Executor threads don't survive a fork; build the pool in the serving process.
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='password-hasher')
+                    self._pid = os.getpid()
+        return self._executor
+
+    def _run(self, fn, *args):
+        if self._slots is None:  # no app configured (scripts, shell)
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HasherBusy()
+        started = time.perf_counter()
+        try:
+            future = self._pool().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot is held until the hash finishes, even if we stop waiting for it.
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            result = future.result(timeout=self.timeout)
+        except TimeoutError:
+            self.rejected += 1
+            raise HasherBusy() from None
+        self._latencies.append(time.perf_counter() - started)
+        return result
+
+    def hash(self, password):
+        self.hashed += 1
+        return self._run(generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, pwhash, password):
+        self.verified += 1
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True if ``pwhash`` was made with different parameters than the configured ones."""
+        return pwhash.split('$', 1)[0] != self.method
+
+    def stats(self):
+        latencies = sorted(self._latencies)
+        return {
+            'workers': getattr(self, 'workers', 0),
+            'max_queue': getattr(self, 'max_queue', 0),
+            'hashed': self.hashed,
+            'verified': self.verified,
+            'rejected': self.rejected,
+            'upgraded': self.upgraded,
+            'latency_avg': round(sum(latencies) / len(latencies), 4) if latencies else None,
+            'latency_p95': round(latencies[int(len(latencies) * 0.95) - 1], 4) if latencies else None,
+        }
+
+
+def hasher_busy(exc):
+    return ('The server is busy signing other people in. Please try again in a moment.',
+            503, {'Retry-After': '2'})
+
+
+hasher = PasswordHasher()
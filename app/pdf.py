@@ -0,0 +1,516 @@
+# app/pdf.py
+
+import glob
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, TimeoutError, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import current_app, render_template
+
+from app import metrics
+from app.instrumentation import instrumentation
+
+logger = logging.getLogger(__name__)
+
+
+PDF_STYLESHEET = 'pdf_invoice.css'
+
+
+def cache_key(invoice_id, html, stylesheet=''):
+    """Content address of a rendered invoice: changes whenever the HTML or stylesheet does."""
+    digest = hashlib.sha256((html + stylesheet).encode('utf-8')).hexdigest()[:32]
+    return f'{invoice_id}-{digest}'
+
+
+def pdf_stylesheet():
+    """The invoice PDF stylesheet, shipped to the render processes with each job."""
+    return current_app.jinja_env.get_template(PDF_STYLESHEET).render()
+
+
+class _BaseCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def stats(self):
+        return {
+            'backend': self.backend,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'entries': self.entries(),
+            'bytes': self.size(),
+            'max_bytes': self.max_bytes,
+        }
+
+
+class NullPDFCache(_BaseCache):
+    backend = 'null'
+
+    def get(self, key):
+        self.misses += 1
+        return None
+
+    def set(self, key, pdf):
+        pass
+
+    def invalidate(self, invoice_id):
+        pass
+
+    def entries(self):
+        return 0
+
+    def size(self):
+        return 0
+
+
+class MemoryPDFCache(_BaseCache):
+    """Per-process LRU bounded by the total size of the cached PDFs."""
+
+    backend = 'memory'
+
+    def __init__(self, max_bytes):
+        super().__init__(max_bytes)
+        self._data = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key):
+        with self._lock:
+            pdf = self._data.get(key)
+            if pdf is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return pdf
+
+    def set(self, key, pdf):
+        if len(pdf) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._data[key] = pdf
+            self._bytes += len(pdf)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def invalidate(self, invoice_id):
+        prefix = f'{invoice_id}-'
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                self._bytes -= len(self._data.pop(key))
+                self.invalidations += 1
+
+    def entries(self):
+        return len(self._data)
+
+    def size(self):
+        return self._bytes
+
+
+class FilesystemPDFCache(_BaseCache):
+    """LRU on disk, shared by every worker process pointing at ``directory``.
+
+    Recency is the file mtime, refreshed on every hit.
+    """
+
+    backend = 'filesystem'
+
+    def __init__(self, directory, max_bytes):
+        super().__init__(max_bytes)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._bytes = sum(size for _, _, size in self._scan())
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.pdf')
+
+    def _scan(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pdf'):
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                yield entry.path, st.st_mtime, st.st_size
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as fh:
+                pdf = fh.read()
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return pdf
+
+    def set(self, key, pdf):
+        if len(pdf) > self.max_bytes:
+            return
+        path = self._path(key)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as fh:
+            fh.write(pdf)
+        try:
+            replaced = os.path.getsize(path)
+        except FileNotFoundError:
+            replaced = 0
+        os.replace(tmp, path)
+        with self._lock:
+            self._bytes += len(pdf) - replaced
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Other processes write here too, so re-measure before evicting.
+        files = sorted(self._scan(), key=lambda f: f[1])
+        self._bytes = sum(size for _, _, size in files)
+        for path, _, size in files:
+            if self._bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._bytes -= size
+            self.evictions += 1
+
+    def invalidate(self, invoice_id):
+        for path in glob.glob(os.path.join(glob.escape(self.directory), f'{invoice_id}-*.pdf')):
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            with self._lock:
+                self._bytes -= size
+            self.invalidations += 1
+
+    def entries(self):
+        return sum(1 for _ in self._scan())
+
+    def size(self):
+        return self._bytes
+
+
+class PDFCache:
+    def init_app(self, app):
+        backend = app.config['PDF_CACHE_BACKEND']
+        max_bytes = app.config['PDF_CACHE_MAX_BYTES']
+        if backend == 'filesystem':
+            directory = app.config['PDF_CACHE_DIR'] or os.path.join(app.instance_path, 'pdf_cache')
+            cache = FilesystemPDFCache(directory, max_bytes)
+        elif backend == 'memory':
+            cache = MemoryPDFCache(max_bytes)
+        elif backend == 'null':
+            cache = NullPDFCache(max_bytes)
+        else:
+            raise ValueError(f'Unknown PDF_CACHE_BACKEND {backend!r}')
+        app.extensions['pdf_cache'] = cache
+        metrics.register('pdf_cache', cache.stats)
+
+    @property
+    def backend(self):
+        return current_app.extensions['pdf_cache']
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def set(self, key, pdf):
+        self.backend.set(key, pdf)
+
+    def invalidate(self, invoice_id):
+        self.backend.invalidate(invoice_id)
+
+    def stats(self):
+        return self.backend.stats()
+
+
+pdf_cache = PDFCache()
+
+
+# Per pool process: the parsed stylesheet and the font configuration it
+# loaded, reused by every document rendered with it.
+_stylesheets = {}
+
+
+def parsed_stylesheet(css):
+    """``(CSS, FontConfiguration)`` for ``css``, parsed on this process's first call."""
+    from weasyprint import CSS
+    from weasyprint.text.fonts import FontConfiguration
+    key = hashlib.sha256(css.encode('utf-8')).digest()
+    if key not in _stylesheets:
+        _stylesheets.clear()  # only the current release's stylesheet is worth keeping
+        font_config = FontConfiguration()
+        _stylesheets[key] = (CSS(string=css, font_config=font_config), font_config)
+    return _stylesheets[key]
+
+
+def _write_pdf(html, css=''):
+    # Runs in a pool process; WeasyPrint is only ever imported there.
+    from weasyprint import HTML
+    stylesheet, font_config = parsed_stylesheet(css)
+    return HTML(string=html).write_pdf(stylesheets=[stylesheet], font_config=font_config)
+
+
+def _write_combined_pdf(documents, css):
+    """One PDF holding the pages of every HTML document in ``documents``, in order."""
+    from weasyprint import HTML
+    stylesheet, font_config = parsed_stylesheet(css)
+    rendered = [HTML(string=html).render(stylesheets=[stylesheet], font_config=font_config)
+                for html in documents]
+    pages = [page for document in rendered for page in document.pages]
+    return rendered[0].copy(pages).write_pdf()
+
+
+class RenderQueueFull(Exception):
+    pass
+
+
+class RenderTimeout(Exception):
+    pass
+
+
+class RenderJob:
+    def __init__(self, key, future):
+        self.key = key
+        self.future = future
+        self.submitted_at = time.monotonic()
+
+    @property
+    def status(self):
+        if self.future.done():
+            return 'failed' if self.future.exception() else 'done'
+        return 'running' if self.future.running() else 'queued'
+
+    def wait(self, timeout=None):
+        """Return the PDF, or None if it isn't ready within ``timeout`` seconds."""
+        try:
+            return self.future.result(timeout=timeout)
+        except TimeoutError:
+            return None
+
+    def then(self, callback):
+        """Call ``callback(pdf)`` from the pool's result thread once rendered."""
+        def done(future):
+            if future.exception() is not None:
+                logger.error('PDF render %s failed', self.key, exc_info=future.exception())
+                return
+            try:
+                callback(future.result())
+            except Exception:
+                logger.exception('PDF render %s callback failed', self.key)
+        self.future.add_done_callback(done)
+
+
+class PDFRenderPool:
+    """Renders PDFs on other cores so request threads only wait, never burn CPU.
+
+    Jobs are keyed by :func:`cache_key`, so concurrent requests for the same
+    invoice share one render and a finished job's result lands in the PDF
+    cache where any worker can pick it up.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._pid = None
+        self._jobs = OrderedDict()
+        self._batch = set()
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.batch_rendered = 0
+
+    def init_app(self, app):
+        self.max_workers = app.config['PDF_RENDER_WORKERS']
+        self.max_queue = app.config['PDF_RENDER_MAX_QUEUE']
+        self.start_method = app.config['PDF_RENDER_START_METHOD']
+        app.extensions['pdf_renderer'] = self
+        metrics.register('pdf_renderer', self.stats)
+
+    def _get_executor(self):
+        # Created lazily, and again after a fork, so pre-forking servers never
+        # share a pool between workers.
+        if self._executor is None or self._pid != os.getpid():
+            context = multiprocessing.get_context(self.start_method) if self.start_method else None
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+            self._pid = os.getpid()
+            self._jobs.clear()
+            self._batch.clear()
+        return self._executor
+
+    def _pool_submit(self, fn, *args):
+        # Called with self._lock held.
+        try:
+            return self._get_executor().submit(fn, *args)
+        except BrokenProcessPool:
+            # A pool process died (OOM, segfault in a native lib): start over.
+            logger.warning('PDF render pool broken, restarting it')
+            self._executor = None
+            return self._get_executor().submit(fn, *args)
+
+    def _pending(self):
+        return sum(1 for job in self._jobs.values() if not job.future.done()) + len(self._batch)
+
+    def has_capacity(self):
+        return self._pending() < self.max_queue
+
+    def submit(self, key, html, cache, css=''):
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.status != 'failed':
+                return job
+            if self._pending() >= self.max_queue:
+                self.rejected += 1
+                raise RenderQueueFull(key)
+            future = self._pool_submit(_write_pdf, html, css)
+            job = RenderJob(key, future)
+            self._jobs[key] = job
+            self.submitted += 1
+            self._prune()
+        future.add_done_callback(lambda _: instrumentation.observe_pdf_latency(time.monotonic() - job.submitted_at))
+        job.future.add_done_callback(lambda future: self._finished(key, future, cache))
+        return job
+
+    def _finished(self, key, future, cache):
+        if future.cancelled() or future.exception() is not None:
+            self.failed += 1
+            return
+        self.completed += 1
+        cache.set(key, future.result())
+
+    def _prune(self, keep=256):
+        finished = [k for k, job in self._jobs.items() if job.future.done()]
+        for key in finished[:max(0, len(finished) - keep)]:
+            del self._jobs[key]
+
+    def get(self, key):
+        return self._jobs.get(key)
+
+    def _submit_batch(self, fn, *args):
+        # Batch renders count against PDF_RENDER_MAX_QUEUE like interactive ones.
+        with self._lock:
+            if self._pending() >= self.max_queue:
+                self.rejected += 1
+                raise RenderQueueFull(fn.__name__)
+            future = self._pool_submit(fn, *args)
+            self._batch.add(future)
+        future.add_done_callback(self._batch.discard)
+        return future
+
+    def render_many(self, documents, css, cache, window=None, timeout=None):
+        """Yield ``(item, pdf)`` for each ``(item, key, html)`` of ``documents``, in the order they finish.
+
+        At most ``window`` renders (two per worker by default) are in flight, so
+        ``documents`` may lazily cover any number of invoices without flooding
+        the queue shared with interactive renders. Cached PDFs are used as they are.
+        While the queue is full, new renders wait for this batch's own to finish;
+        :class:`RenderQueueFull` is raised only when none of them is in flight.
+        :class:`RenderTimeout` is raised if no render finishes within ``timeout`` seconds.
+        """
+        window = window or self.max_workers * 2
+        documents = iter(documents)
+        pending = {}
+        exhausted = False
+        try:
+            while pending or not exhausted:
+                while not exhausted and len(pending) < window:
+                    if pending and not self.has_capacity():
+                        break
+                    entry = next(documents, None)
+                    if entry is None:
+                        exhausted = True
+                        break
+                    item, key, html = entry
+                    pdf = cache.get(key)
+                    if pdf is not None:
+                        yield item, pdf
+                    else:
+                        pending[self._submit_batch(_write_pdf, html, css)] = item
+                if pending:
+                    done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                    if not done:
+                        raise RenderTimeout(f'no PDF rendered within {timeout}s')
+                    for future in done:
+                        item = pending.pop(future)
+                        self.batch_rendered += 1
+                        yield item, future.result()
+        finally:
+            # The client went away or a render failed: don't render the rest for nobody.
+            for future in pending:
+                future.cancel()
+
+    def render_combined(self, documents, css, timeout=None):
+        """One PDF of all the HTML ``documents``; laid out in a single pool process, as one document.
+
+        Raises :class:`RenderQueueFull` when the pool is saturated and
+        :class:`RenderTimeout` when the PDF isn't ready within ``timeout`` seconds.
+        """
+        future = self._submit_batch(_write_combined_pdf, documents, css)
+        try:
+            pdf = future.result(timeout=timeout)
+        except TimeoutError:
+            future.cancel()
+            raise RenderTimeout(f'{len(documents)} documents not rendered within {timeout}s') from None
+        self.batch_rendered += len(documents)
+        return pdf
+
+    def shutdown(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
+    def stats(self):
+        return {
+            'workers': self.max_workers,
+            'max_queue': self.max_queue,
+            'pending': self._pending(),
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'batch_rendered': self.batch_rendered,
+        }
+
+
+pdf_renderer = PDFRenderPool()
+
+
+def submit_invoice_pdf(invoice):
+    """Return ``(pdf, None)`` on a cache hit, otherwise ``(None, job)``.
+
+    Raises :class:`RenderQueueFull` when the pool is saturated.
+    """
+    html = render_template('pdf_template.html', invoice=invoice)
+    css = pdf_stylesheet()
+    key = cache_key(invoice.id, html, css)
+    pdf = pdf_cache.get(key)
+    if pdf is not None:
+        return pdf, None
+    return None, pdf_renderer.submit(key, html, pdf_cache.backend, css)
+
+
+def render_invoice_pdf(invoice, timeout=None):
+    pdf, job = submit_invoice_pdf(invoice)
+    if pdf is None:
+        pdf = job.future.result(timeout=timeout)
+    return pdf
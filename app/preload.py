@@ -0,0 +1,66 @@
+# app/preload.py
+#
+# Optional hooks for pre-forking servers (see gunicorn.conf.py). warm_up()
+# runs once in the master so every worker inherits compiled templates,
+# configured mappers and, when PDFs render in forked processes, an imported
+# WeasyPrint with its fonts loaded and the invoice stylesheet parsed.
+# after_fork() runs in each worker.
+# The thread and process pools (mail, password hashing, PDF rendering,
+# scheduler) already start themselves lazily per process.
+
+import logging
+import multiprocessing
+import time
+from contextlib import contextmanager
+
+from sqlalchemy.orm import configure_mappers
+
+from app import db
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def _timed(timings, name):
+    started = time.perf_counter()
+    yield
+    timings[name] = round(time.perf_counter() - started, 4)
+
+
+def warm_up(app):
+    """Do the one-off startup work before forking; returns seconds spent per step."""
+    timings = {}
+    with _timed(timings, 'templates'):
+        for name in app.jinja_env.list_templates(filter_func=lambda n: n.endswith(('.html', '.txt'))):
+            app.jinja_env.get_template(name)
+
+    with _timed(timings, 'database'), app.app_context():
+        configure_mappers()
+        for engine in db.engines.values():
+            with engine.connect() as conn:
+                conn.exec_driver_sql('SELECT 1')
+            # Connections must not be shared with the children.
+            engine.dispose()
+
+    start_method = app.config['PDF_RENDER_START_METHOD'] or multiprocessing.get_start_method()
+    if start_method == 'fork':
+        with _timed(timings, 'pdf'):
+            try:
+                from weasyprint import HTML
+            except ImportError:
+                logger.warning('WeasyPrint is not installed; skipping its warm-up')
+            else:
+                from app.pdf import parsed_stylesheet, pdf_stylesheet
+                with app.app_context():
+                    parsed_stylesheet(pdf_stylesheet())
+                HTML(string='<p>warm-up</p>').write_pdf()
+
+    logger.info('Warm-up done: %s', timings)
+    return timings
+
+
+def after_fork(app):
+    """Drop any pooled connection a worker inherited without closing the parent's socket."""
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
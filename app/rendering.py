@@ -0,0 +1,34 @@
+# app/rendering.py
+#
+# Long list pages are streamed: Jinja renders the template as a generator
+# and each chunk goes out as soon as it is ready, while a lazy KeysetPage
+# fetches the rows behind it in batches. STREAM_TEMPLATES=False renders
+# them in one piece instead.
+
+from flask import current_app, get_flashed_messages, render_template, stream_template
+
+# Jinja yields a chunk per template node; write them out in blocks of about this many characters.
+STREAM_BUFFER = 4096
+
+
+def _buffered(chunks, size):
+    buffer, buffered = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= size:
+            yield ''.join(buffer)
+            buffer, buffered = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def render_list(template, **context):
+    """``render_template``, streamed when STREAM_TEMPLATES is on."""
+    if not current_app.config['STREAM_TEMPLATES']:
+        return render_template(template, **context)
+    # The session cookie goes out with the headers, before the template pops
+    # the flashed messages, so pop them now; base.html gets them from the
+    # request's copy.
+    get_flashed_messages(with_categories=True)
+    return current_app.response_class(_buffered(stream_template(template, **context), STREAM_BUFFER))
@@ -0,0 +1,139 @@
+# app/replicas.py
+#
+# Read replicas. Config turns each DATABASE_REPLICA_URIS entry into a
+# 'replica_<n>' bind. Views decorated with @read_only send their SELECTs to
+# one of those replicas, chosen round-robin once per database session.
+# Everything else goes to the primary: writes, flushes, SELECT ... FOR
+# UPDATE, undecorated views, CLI commands and the scheduler. A replica that
+# can't be reached is skipped for REPLICA_RETRY_SECONDS, and with none left
+# reads fall back to the primary.
+#
+# Read-your-writes: after a write, the rest of that database session reads
+# from the primary. So do the same user's @read_only views for the next
+# REPLICA_STICKY_SECONDS (a timestamp in the Flask session), so replication
+# lag never hides somebody's own change from them.
+
+import logging
+import threading
+import time
+from functools import wraps
+from itertools import count
+
+from flask import has_request_context, session as flask_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import exc
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.dml import UpdateBase
+
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+REPLICA_PREFIX = 'replica_'
+STICKY_KEY = '_primary_until'
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy's session, with SELECTs of @read_only views routed to a replica."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._flushing or isinstance(clause, UpdateBase):
+                if replicas.names and not self.info.get('wrote'):
+                    self.info['wrote'] = True
+                    replicas.stick()
+            elif (self.info.get('read_only') and not self.info.get('wrote')
+                    and isinstance(clause, Select) and clause._for_update_arg is None):
+                engine = replicas.engine_for(self)
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class Replicas:
+    def __init__(self):
+        self.names = []
+        self._lock = threading.Lock()
+        self._turn = count()
+        self._down_until = {}
+        self.routed = 0
+        self.fallbacks = 0
+        self.failures = 0
+
+    def init_app(self, app):
+        self.names = sorted(k for k in app.config.get('SQLALCHEMY_BINDS') or {} if k.startswith(REPLICA_PREFIX))
+        self.retry_seconds = app.config['REPLICA_RETRY_SECONDS']
+        self.sticky_seconds = app.config['REPLICA_STICKY_SECONDS']
+        app.extensions['replicas'] = self
+        metrics.register('replicas', self.stats)
+
+    def stick(self):
+        """Keep the current user's reads on the primary for a while after they wrote something."""
+        if has_request_context() and self.sticky_seconds > 0:
+            flask_session[STICKY_KEY] = time.time() + self.sticky_seconds
+
+    def is_sticky(self):
+        return has_request_context() and flask_session.get(STICKY_KEY, 0) > time.time()
+
+    def engine_for(self, session):
+        """The replica engine this session reads from, or None for the primary."""
+        if 'replica' not in session.info:
+            session.info['replica'] = self._pick()
+        return session.info['replica']
+
+    def _pick(self):
+        from app import db
+        with self._lock:
+            start = next(self._turn)
+        for offset in range(len(self.names)):
+            name = self.names[(start + offset) % len(self.names)]
+            if self._down_until.get(name, 0) > time.monotonic():
+                continue
+            engine = db.engines[name]
+            try:
+                # Checks a pooled connection out and straight back in; only a
+                # new connection (or pool_pre_ping) costs a round trip.
+                engine.connect().close()
+            except exc.DBAPIError as error:
+                logger.warning('Replica %s unreachable, reading from elsewhere for %ss: %s',
+                               name, self.retry_seconds, error.orig)
+                with self._lock:
+                    self._down_until[name] = time.monotonic() + self.retry_seconds
+                    self.failures += 1
+                continue
+            with self._lock:
+                self.routed += 1
+            return engine
+        with self._lock:
+            self.fallbacks += 1
+        return None
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            'replicas': len(self.names),
+            'down': [name for name in self.names if self._down_until.get(name, 0) > now],
+            'routed_sessions': self.routed,
+            'primary_fallbacks': self.fallbacks,
+            'connect_failures': self.failures,
+        }
+
+
+replicas = Replicas()
+
+
+def read_only(view):
+    """Serve the view's queries from a replica unless the user wrote something moments ago."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not replicas.names or replicas.is_sticky():
+            return view(*args, **kwargs)
+        from app import db
+        session = db.session()
+        previous = session.info.get('read_only')
+        session.info['read_only'] = True
+        try:
+            return view(*args, **kwargs)
+        finally:
+            session.info['read_only'] = previous
+    return wrapper
@@ -0,0 +1,247 @@
+# app/rollup.py
+#
+# Maintains the denormalized invoice aggregates incrementally: MonthlyRevenue
+# and the per-client counters on Client. Every invoice write passes the
+# invoice's snapshot before and after the change to apply_invoice_change()
+# inside the same transaction, so reads never have to scan invoices.
+
+from collections import Counter, namedtuple
+
+from sqlalchemy import Integer, and_, bindparam, case, cast, extract, func, insert, or_, select, update
+
+from app import db
+from app.models import Client, Invoice, MonthlyRevenue
+
+InvoiceSnapshot = namedtuple('InvoiceSnapshot', 'user_id client_id issue_date total_amount status')
+
+COUNTERS = ('invoice_count', 'revenue', 'paid_count', 'paid_revenue', 'unpaid_count', 'overdue_count')
+
+
+def snapshot(invoice):
+    return InvoiceSnapshot(invoice.user_id, invoice.client_id, invoice.issue_date, invoice.total_amount or 0.0,
+                           invoice.status or 'unpaid')
+
+
+def _contribution(snap):
+    paid = snap.status == 'paid'
+    return {
+        'invoice_count': 1,
+        'revenue': snap.total_amount,
+        'paid_count': 1 if paid else 0,
+        'paid_revenue': snap.total_amount if paid else 0.0,
+        'unpaid_count': 1 if snap.status == 'unpaid' else 0,
+        'overdue_count': 1 if snap.status == 'overdue' else 0,
+    }
+
+
+def _accumulate(deltas, snap, sign):
+    key = (snap.user_id, snap.issue_date.year, snap.issue_date.month)
+    totals = deltas.setdefault(key, dict.fromkeys(COUNTERS, 0))
+    for name, value in _contribution(snap).items():
+        totals[name] += sign * value
+
+
+def _apply(deltas):
+    rows = [
+        {'user_id': user_id, 'year': year, 'month': month, **totals}
+        for (user_id, year, month), totals in deltas.items()
+        if any(totals.values())
+    ]
+    if rows:
+        add_to_months(rows)
+
+
+def apply_invoice_change(before, after):
+    """Move an invoice's contribution from ``before`` to ``after`` (either may be None)."""
+    apply_invoice_changes([(before, after)])
+
+
+def apply_invoice_changes(changes):
+    """Apply many ``(before, after)`` pairs with a single upsert."""
+    deltas, clients = {}, {}
+    for before, after in changes:
+        if before is not None:
+            _accumulate(deltas, before, -1)
+            _accumulate_client(clients, before, -1)
+        if after is not None:
+            _accumulate(deltas, after, 1)
+            _accumulate_client(clients, after, 1)
+    _apply(deltas)
+    _apply_clients(clients)
+
+
+def add_invoices(snapshots):
+    """Add many new invoices at once: one upsert per month touched, not per invoice."""
+    apply_invoice_changes((None, snap) for snap in snapshots)
+
+
+# ---- per-client counters ----
+#
+# Outstanding balance counts every invoice that isn't paid. invoice_count and
+# the balance move by deltas; last_invoice_date only ever moves forward when
+# invoices are added, and is re-read from the invoices when one is removed
+# or re-dated.
+
+class _ClientDelta:
+    __slots__ = ('invoice_count', 'outstanding_balance', 'added', 'removed')
+
+    def __init__(self):
+        self.invoice_count = 0
+        self.outstanding_balance = 0.0
+        self.added = Counter()
+        self.removed = Counter()
+
+
+def _accumulate_client(clients, snap, sign):
+    delta = clients.setdefault(snap.client_id, _ClientDelta())
+    delta.invoice_count += sign
+    if snap.status != 'paid':
+        delta.outstanding_balance += sign * snap.total_amount
+    (delta.added if sign > 0 else delta.removed)[snap.issue_date] += 1
+
+
+def _apply_clients(clients):
+    table = Client.__table__
+    rows, recompute = [], []
+    for client_id, delta in clients.items():
+        # A removed date that wasn't re-added may have been the latest one.
+        if delta.removed - delta.added:
+            recompute.append(client_id)
+        new_dates = delta.added - delta.removed
+        added = max(new_dates) if new_dates and client_id not in recompute else None
+        if delta.invoice_count or delta.outstanding_balance or added is not None:
+            rows.append({'client': client_id, 'count': delta.invoice_count,
+                         'balance': delta.outstanding_balance, 'added': added})
+
+    if rows:
+        added = bindparam('added', type_=table.c.last_invoice_date.type)
+        db.session.execute(
+            update(table)
+            .where(table.c.id == bindparam('client'))
+            .values(
+                invoice_count=table.c.invoice_count + bindparam('count'),
+                outstanding_balance=table.c.outstanding_balance + bindparam('balance'),
+                last_invoice_date=case(
+                    (and_(added.isnot(None), or_(table.c.last_invoice_date.is_(None),
+                                                 table.c.last_invoice_date < added)), added),
+                    else_=table.c.last_invoice_date,
+                ),
+            ),
+            rows,
+        )
+    if recompute:
+        db.session.flush()
+        db.session.execute(
+            update(table)
+            .where(table.c.id.in_(recompute))
+            .values(last_invoice_date=select(func.max(Invoice.issue_date))
+                    .where(Invoice.client_id == table.c.id)
+                    .scalar_subquery())
+        )
+
+
+def add_to_months(rows):
+    """Atomically add each row's counters to its month, creating months as needed."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    else:
+        upsert = None
+
+    if upsert is not None:
+        stmt = upsert(MonthlyRevenue)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id', 'year', 'month'],
+            set_={name: getattr(MonthlyRevenue, name) + stmt.excluded[name] for name in COUNTERS},
+        )
+        db.session.execute(stmt, rows)
+        return
+
+    for values in rows:
+        key = (values['user_id'], values['year'], values['month'])
+        row = db.session.get(MonthlyRevenue, key, with_for_update=True)
+        if row is None:
+            db.session.add(MonthlyRevenue(**values))
+        else:
+            for name in COUNTERS:
+                setattr(row, name, getattr(row, name) + values[name])
+    db.session.flush()
+
+
+def rebuild(user_id=None):
+    """Recompute the rollup from invoices with one grouped INSERT ... SELECT."""
+    delete = db.delete(MonthlyRevenue)
+    if user_id is not None:
+        delete = delete.where(MonthlyRevenue.user_id == user_id)
+    db.session.execute(delete)
+
+    paid = Invoice.status == 'paid'
+    amount = func.coalesce(Invoice.total_amount, 0.0)
+    year = cast(extract('year', Invoice.issue_date), Integer)
+    month = cast(extract('month', Invoice.issue_date), Integer)
+    grouped = select(
+        Invoice.user_id,
+        year,
+        month,
+        func.count(Invoice.id),
+        func.sum(amount),
+        func.sum(case((paid, 1), else_=0)),
+        func.sum(case((paid, amount), else_=0.0)),
+        func.sum(case((Invoice.status == 'unpaid', 1), else_=0)),
+        func.sum(case((Invoice.status == 'overdue', 1), else_=0)),
+    ).group_by(Invoice.user_id, year, month)
+    if user_id is not None:
+        grouped = grouped.where(Invoice.user_id == user_id)
+
+    db.session.execute(insert(MonthlyRevenue).from_select(
+        ['user_id', 'year', 'month', *COUNTERS], grouped))
+    db.session.commit()
+
+
+def reconcile_clients(user_id=None):
+    """Recompute every client's counters from its invoices with one grouped query.
+
+    Only clients whose stored values drifted are written; returns how many.
+    """
+    totals = (
+        select(
+            Invoice.client_id,
+            func.count(Invoice.id).label('invoice_count'),
+            func.sum(case((Invoice.status != 'paid', func.coalesce(Invoice.total_amount, 0.0)), else_=0.0))
+                .label('outstanding_balance'),
+            func.max(Invoice.issue_date).label('last_invoice_date'),
+        )
+        .group_by(Invoice.client_id)
+        .subquery()
+    )
+    query = (
+        select(
+            Client.id,
+            Client.invoice_count, Client.outstanding_balance, Client.last_invoice_date,
+            func.coalesce(totals.c.invoice_count, 0),
+            func.coalesce(totals.c.outstanding_balance, 0.0),
+            totals.c.last_invoice_date,
+        )
+        .outerjoin(totals, totals.c.client_id == Client.id)
+    )
+    if user_id is not None:
+        query = query.where(Client.user_id == user_id)
+
+    fixes = []
+    for client_id, count, balance, last, true_count, true_balance, true_last in db.session.execute(query):
+        if count != true_count or abs((balance or 0.0) - true_balance) > 0.005 or last != true_last:
+            fixes.append({'client': client_id, 'count': true_count, 'balance': round(true_balance, 2),
+                          'last': true_last})
+    if fixes:
+        table = Client.__table__
+        db.session.execute(
+            update(table)
+            .where(table.c.id == bindparam('client'))
+            .values(invoice_count=bindparam('count'), outstanding_balance=bindparam('balance'),
+                    last_invoice_date=bindparam('last')),
+            fixes,
+        )
+    db.session.commit()
+    return len(fixes)
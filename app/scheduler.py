@@ -0,0 +1,81 @@
+# app/scheduler.py
+
+import logging
+import os
+import threading
+import time
+
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Scheduler:
+    """Runs registered jobs every ``interval`` seconds on a daemon thread.
+
+    Optional: a job with interval 0 is never started, and cron can call the
+    equivalent CLI command instead. Each web process runs its own thread
+    (started by the first request it serves, so it survives pre-fork servers),
+    which means jobs must be idempotent.
+    """
+
+    def __init__(self):
+        self.app = None
+        self._jobs = []
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def init_app(self, app):
+        self.app = app
+        self._jobs = []
+        app.extensions['scheduler'] = self
+        app.before_request(self._ensure_started)
+        metrics.register('scheduler', self.stats)
+
+    def add(self, name, interval, fn):
+        """Call ``fn()`` inside an app context every ``interval`` seconds (0 disables)."""
+        if interval > 0:
+            self._jobs.append({'name': name, 'interval': interval, 'fn': fn,
+                               'runs': 0, 'failures': 0, 'last_run': None, 'last_seconds': None})
+
+    def _ensure_started(self):
+        if not self._jobs or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._stop.clear()
+            threading.Thread(target=self._run, name='scheduler', daemon=True).start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        due = {job['name']: time.monotonic() for job in self._jobs}
+        while not self._stop.is_set():
+            now = time.monotonic()
+            for job in self._jobs:
+                if due[job['name']] <= now:
+                    self._run_job(job)
+                    due[job['name']] = time.monotonic() + job['interval']
+            self._stop.wait(max(0.0, min(due.values()) - time.monotonic()))
+
+    def _run_job(self, job):
+        started = time.perf_counter()
+        try:
+            with self.app.app_context():
+                job['fn']()
+        except Exception:
+            job['failures'] += 1
+            logger.exception('Scheduled job %s failed', job['name'])
+        job['runs'] += 1
+        job['last_run'] = time.time()
+        job['last_seconds'] = round(time.perf_counter() - started, 4)
+
+    def shutdown(self):
+        self._stop.set()
+
+    def stats(self):
+        return {job['name']: {k: v for k, v in job.items() if k != 'fn'} for job in self._jobs}
+
+
+scheduler = Scheduler()
@@ -0,0 +1,88 @@
+// Type-ahead client picker for the invoice forms: queries /clients/search.json
+// as the user types and stores the chosen client's id in the hidden input.
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('.client-picker').forEach(setupClientPicker);
+});
+
+function setupClientPicker(picker) {
+    const input = picker.querySelector('.client-picker-input');
+    const hidden = picker.querySelector('input[type="hidden"]');
+    const results = picker.querySelector('.client-picker-results');
+    const searchUrl = picker.dataset.searchUrl;
+    let timer = null;
+    let request = 0;
+    let nextCursor = null;
+
+    function close() {
+        results.innerHTML = '';
+        results.classList.remove('open');
+    }
+
+    function choose(client) {
+        hidden.value = client.id;
+        input.value = client.name;
+        close();
+    }
+
+    function render(clients, append) {
+        if (!append) results.innerHTML = '';
+        results.querySelector('.client-picker-more')?.remove();
+
+        clients.forEach(client => {
+            const option = document.createElement('button');
+            option.type = 'button';
+            option.className = 'client-picker-option';
+            option.setAttribute('role', 'option');
+            const name = document.createElement('strong');
+            name.textContent = client.name;
+            const detail = document.createElement('span');
+            detail.textContent = [client.company, client.email].filter(Boolean).join(' · ');
+            option.append(name, detail);
+            option.addEventListener('click', () => choose(client));
+            results.appendChild(option);
+        });
+
+        if (!results.children.length) {
+            const empty = document.createElement('div');
+            empty.className = 'client-picker-empty';
+            empty.textContent = 'No matching clients';
+            results.appendChild(empty);
+        }
+        if (nextCursor) {
+            const more = document.createElement('button');
+            more.type = 'button';
+            more.className = 'client-picker-more';
+            more.textContent = 'More results…';
+            more.addEventListener('click', () => search(true));
+            results.appendChild(more);
+        }
+        results.classList.add('open');
+    }
+
+    function search(append) {
+        const params = new URLSearchParams({q: input.value.trim(), limit: 10});
+        if (append && nextCursor) params.set('after', nextCursor);
+        const current = ++request;
+        fetch(`${searchUrl}?${params}`, {headers: {'Accept': 'application/json'}, credentials: 'same-origin'})
+            .then(response => response.ok ? response.json() : Promise.reject(response.status))
+            .then(data => {
+                if (current !== request) return;  // a newer search is in flight
+                nextCursor = data.next_cursor;
+                render(data.results, append);
+            })
+            .catch(() => close());
+    }
+
+    input.addEventListener('input', function() {
+        hidden.value = '';
+        clearTimeout(timer);
+        timer = setTimeout(() => search(false), 200);
+    });
+    input.addEventListener('focus', () => search(false));
+    input.addEventListener('keydown', function(e) {
+        if (e.key === 'Escape') close();
+    });
+    document.addEventListener('click', function(e) {
+        if (!picker.contains(e.target)) close();
+    });
+}
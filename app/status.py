@@ -0,0 +1,77 @@
+# app/status.py
+#
+# Invoice status is stored, never derived at read time: an unpaid invoice
+# becomes 'overdue' when mark_overdue() runs after its due date (from the
+# scheduler or `flask invoices mark-overdue`), and refresh() fixes up a single
+# invoice whenever it is written. Everything that asks "what is today" for
+# due-date purposes goes through today().
+
+from collections import defaultdict
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from flask import current_app
+from sqlalchemy import update
+
+from app import db, rollup
+from app.models import Invoice
+
+PAID = 'paid'
+UNPAID = 'unpaid'
+OVERDUE = 'overdue'
+OUTSTANDING = (UNPAID, OVERDUE)
+
+
+def today():
+    """The current date in BUSINESS_TIMEZONE; an invoice due today is not yet overdue."""
+    return datetime.now(ZoneInfo(current_app.config['BUSINESS_TIMEZONE'])).date()
+
+
+def status_for(status, due_date, on=None):
+    """Outstanding invoices are overdue once ``due_date`` has passed; paid ones stay paid."""
+    if status == PAID:
+        return PAID
+    return OVERDUE if due_date < (on or today()) else UNPAID
+
+
+def refresh(invoice, on=None):
+    invoice.status = status_for(invoice.status, invoice.due_date, on)
+
+
+def mark_overdue(user_id=None, on=None):
+    """Move every unpaid invoice past its due date to 'overdue' with one UPDATE.
+
+    Keeps the monthly rollup in step, commits, drops the affected users'
+    cached dashboard counts and PDFs, and returns how many invoices moved
+    per user id.
+    """
+    # Imported here: app.invoices loads its routes, which import this module.
+    from app.invoices.changes import invoices_changed
+
+    on = on or today()
+    stmt = (
+        update(Invoice)
+        .where(Invoice.status == UNPAID, Invoice.due_date < on)
+        .values(status=OVERDUE, updated_at=datetime.utcnow(), version=Invoice.version + 1)
+        .returning(Invoice.id, Invoice.user_id, Invoice.client_id, Invoice.issue_date, Invoice.total_amount)
+        .execution_options(synchronize_session=False)
+    )
+    if user_id is not None:
+        stmt = stmt.where(Invoice.user_id == user_id)
+    rows = db.session.execute(stmt).all()
+
+    changes = []
+    for _, user, client_id, issue_date, total in rows:
+        before = rollup.InvoiceSnapshot(user, client_id, issue_date, total or 0.0, UNPAID)
+        changes.append((before, before._replace(status=OVERDUE)))
+    rollup.apply_invoice_changes(changes)
+    db.session.commit()
+
+    # The UPDATE bypassed the identity map; don't let stale statuses linger.
+    db.session.expire_all()
+    moved = defaultdict(list)
+    for invoice_id, user, *_ in rows:
+        moved[user].append(invoice_id)
+    for user, invoice_ids in moved.items():
+        invoices_changed(user, invoice_ids)
+    return {user: len(invoice_ids) for user, invoice_ids in moved.items()}
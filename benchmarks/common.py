@@ -0,0 +1,77 @@
+"""Shared helpers for the benchmark scripts in this directory."""
+import os
+import sys
+import tempfile
+from collections import Counter
+
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+
+
+def bench_app(database_uri=None, **overrides):
+    """App bound to ``database_uri`` (default: a fresh temporary SQLite file) with tables created."""
+    from app import create_app, db
+
+    if database_uri is None:
+        fd, path = tempfile.mkstemp(suffix='.db', prefix='bench-')
+        os.close(fd)
+        database_uri = f'sqlite:///{path}'
+
+    class BenchConfig(Config):
+        SECRET_KEY = 'bench'
+        SQLALCHEMY_DATABASE_URI = database_uri
+        WTF_CSRF_ENABLED = False
+        MAIL_SUPPRESS_SEND = True
+
+    for key, value in overrides.items():
+        setattr(BenchConfig, key, value)
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def create_user(email='bench@example.com', name='Bench'):
+    from app import db
+    from app.models import User
+
+    user = User(email=email, name=name, password_hash='!', is_verified=True)
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+class StatementCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = Counter()
+        self.rows = Counter()
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._count)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._count)
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany):
+        verb = statement.lstrip().split(None, 1)[0].upper()
+        self.statements[verb] += 1
+        # insertmanyvalues reports executemany=True with a single row's tuple
+        self.rows[verb] += len(parameters) if executemany and isinstance(parameters, list) else 1
+
+    def report(self):
+        return {'statements': dict(self.statements), 'rows': dict(self.rows),
+                'total_statements': sum(self.statements.values())}
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    if not samples:
+        return {}
+    pick = lambda q: round(samples[min(len(samples) - 1, int(len(samples) * q))] * 1000, 2)  # noqa: E731
+    return {'p50_ms': pick(0.50), 'p95_ms': pick(0.95), 'p99_ms': pick(0.99), 'max_ms': pick(1.0)}
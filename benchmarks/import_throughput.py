@@ -0,0 +1,91 @@
+"""Throughput and peak memory of the streaming CSV importer.
+
+    python benchmarks/import_throughput.py --clients 50000 --invoices 200000 --items 3
+
+Generates the CSV files on disk first, then times app.importer on them and
+prints a JSON report. Peak memory is measured with tracemalloc and should
+stay roughly constant as the row counts grow.
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from common import bench_app, create_user
+
+
+def write_clients(path, count):
+    with open(path, 'w', newline='') as fh:
+        writer = csv.writer(fh)
+        writer.writerow(['name', 'email', 'phone', 'company', 'notes'])
+        for i in range(count):
+            writer.writerow([f'Client {i}', f'client{i}@example.com', f'555-{i:07d}', f'Company {i % 997}', ''])
+
+
+def write_invoices(path, count, items, clients):
+    start = date(2023, 1, 1)
+    rng = random.Random(42)
+    with open(path, 'w', newline='') as fh:
+        writer = csv.writer(fh)
+        writer.writerow(['invoice_ref', 'client_email', 'issue_date', 'due_date', 'status',
+                         'description', 'quantity', 'unit_price'])
+        for i in range(count):
+            issued = start + timedelta(days=rng.randrange(730))
+            client = f'client{rng.randrange(clients)}@example.com'
+            status = rng.choice(['paid', 'unpaid'])
+            for n in range(items):
+                writer.writerow([f'INV-{i}', client, issued.isoformat(), (issued + timedelta(days=30)).isoformat(),
+                                 status, f'Item {n}', rng.randint(1, 10), f'{rng.uniform(5, 500):.2f}'])
+
+
+def timed(fn, *args, **kwargs):
+    tracemalloc.start()
+    started = time.perf_counter()
+    report = fn(*args, **kwargs)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return report, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=5000)
+    parser.add_argument('--invoices', type=int, default=20000)
+    parser.add_argument('--items', type=int, default=3, help='line items per invoice')
+    parser.add_argument('--database-uri', default=None, help='default: a temporary SQLite file')
+    args = parser.parse_args()
+
+    from app.importer import import_clients, import_invoices
+
+    app = bench_app(args.database_uri)
+    workdir = tempfile.mkdtemp(prefix='bench-import-')
+    clients_csv = os.path.join(workdir, 'clients.csv')
+    invoices_csv = os.path.join(workdir, 'invoices.csv')
+    write_clients(clients_csv, args.clients)
+    write_invoices(invoices_csv, args.invoices, args.items, args.clients)
+
+    results = {}
+    with app.app_context():
+        user_id = create_user()
+        for name, fn, path in (('clients', import_clients, clients_csv), ('invoices', import_invoices, invoices_csv)):
+            with open(path, 'rb') as fh:
+                report, elapsed, peak = timed(fn, fh, user_id)
+            results[name] = {
+                'rows': report.rows,
+                'created': report.created,
+                'failed': report.failed,
+                'seconds': round(elapsed, 3),
+                'rows_per_second': round(report.rows / elapsed) if elapsed else None,
+                'peak_memory_mb': round(peak / 1024 / 1024, 2),
+            }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
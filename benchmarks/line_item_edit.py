@@ -0,0 +1,86 @@
+"""SQL statements issued by an invoice edit: replace-all vs diff-based line items.
+
+    python benchmarks/line_item_edit.py --items 300
+
+Creates an invoice with ``--items`` line items, then saves an edit that
+changes a single unit price, first the old way (clear and re-insert every
+line item) and then through app.invoices.changes.set_line_items. Prints a
+JSON report with the statements executed and rows written by each flush.
+"""
+import argparse
+import json
+import time
+from datetime import date
+
+from common import StatementCounter, bench_app, create_user
+
+
+def make_invoice(user_id, items):
+    from app import db
+    from app.invoices.changes import set_line_items
+    from app.models import Client, Invoice
+
+    client = Client(name='Bench client', user_id=user_id)
+    invoice = Invoice(user_id=user_id, client=client, issue_date=date(2024, 1, 1), due_date=date(2024, 2, 1))
+    set_line_items(invoice, [
+        {'description': f'Item {n}', 'quantity': 1 + n % 5, 'unit_price': 10.0 + n} for n in range(items)])
+    db.session.add(invoice)
+    db.session.commit()
+    return invoice.id
+
+
+def edited_items(invoice):
+    items = [{'id': item.id, 'description': item.description, 'quantity': item.quantity,
+              'unit_price': item.unit_price} for item in sorted(invoice.line_items, key=lambda i: i.id)]
+    items[len(items) // 2]['unit_price'] += 1.5
+    return items
+
+
+def replace_all(invoice, items):
+    """What edit_invoice did before: drop every row and insert the lot again."""
+    from app.models import LineItem
+
+    invoice.line_items.clear()
+    total = 0
+    for values in items:
+        item_total = values['quantity'] * values['unit_price']
+        total += item_total
+        invoice.line_items.append(LineItem(description=values['description'], quantity=values['quantity'],
+                                           unit_price=values['unit_price'], total=item_total))
+    invoice.total_amount = total
+
+
+def measure(strategy, invoice_id):
+    from app import db
+    from app.invoices.changes import set_line_items
+    from app.models import Invoice
+
+    invoice = db.session.get(Invoice, invoice_id)
+    items = edited_items(invoice)
+    apply = replace_all if strategy == 'replace_all' else set_line_items
+    with StatementCounter(db.engine) as counter:
+        started = time.perf_counter()
+        apply(invoice, items)
+        db.session.commit()
+        elapsed = time.perf_counter() - started
+    db.session.expire_all()
+    return {**counter.report(), 'milliseconds': round(elapsed * 1000, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=300, help='line items on the invoice')
+    parser.add_argument('--database-uri', default=None, help='default: a temporary SQLite file')
+    args = parser.parse_args()
+
+    app = bench_app(args.database_uri)
+    results = {'items': args.items}
+    with app.app_context():
+        user_id = create_user()
+        for strategy in ('replace_all', 'diff'):
+            results[strategy] = measure(strategy, make_invoice(user_id, args.items))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Login throughput and the latency of other requests during a login storm.
+
+    python benchmarks/login_throughput.py --threads 32 --logins 200 --workers 2 --max-queue 16
+
+``--threads`` client threads POST /login as fast as they can while one more
+thread keeps requesting a cheap page. The JSON report has logins per second,
+login latency percentiles, how many logins were turned away with a 503, and
+the latency of the cheap page, which is what the bounded hashing pool protects.
+"""
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import bench_app, percentiles
+
+
+def create_users(app, count, password):
+    from app import db
+    from app.models import User
+    from app.passwords import hasher
+
+    with app.app_context():
+        pwhash = hasher.hash(password)
+        db.session.add_all(User(email=f'user{i}@example.com', name=f'User {i}', password_hash=pwhash,
+                                is_verified=True) for i in range(count))
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16, help='concurrent login clients')
+    parser.add_argument('--logins', type=int, default=100, help='total login attempts')
+    parser.add_argument('--workers', type=int, default=None, help='PASSWORD_HASH_WORKERS')
+    parser.add_argument('--max-queue', type=int, default=None, help='PASSWORD_HASH_MAX_QUEUE')
+    parser.add_argument('--method', default=None, help='PASSWORD_HASH_METHOD')
+    parser.add_argument('--database-uri', default=None, help='default: a temporary SQLite file')
+    args = parser.parse_args()
+
+    overrides = {'USER_CACHE_TTL': 0}
+    for name, value in (('PASSWORD_HASH_WORKERS', args.workers), ('PASSWORD_HASH_MAX_QUEUE', args.max_queue),
+                        ('PASSWORD_HASH_METHOD', args.method)):
+        if value is not None:
+            overrides[name] = value
+    app = bench_app(args.database_uri, **overrides)
+    password = 'correct horse battery staple'
+    create_users(app, args.threads, password)
+
+    latencies, statuses, lock = [], {}, threading.Lock()
+    done = threading.Event()
+
+    def login(n):
+        client = app.test_client()
+        started = time.perf_counter()
+        response = client.post('/login', data={'email': f'user{n % args.threads}@example.com',
+                                               'password': password})
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    background = []
+
+    def poll_cheap_page():
+        client = app.test_client()
+        while not done.is_set():
+            started = time.perf_counter()
+            client.get('/')
+            background.append(time.perf_counter() - started)
+            time.sleep(0.01)
+
+    poller = threading.Thread(target=poll_cheap_page, daemon=True)
+    poller.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.threads) as pool:
+        list(pool.map(login, range(args.logins)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    poller.join()
+
+    from app.passwords import hasher
+    print(json.dumps({
+        'threads': args.threads,
+        'logins': args.logins,
+        'hasher': {'method': hasher.method, 'workers': hasher.workers, 'max_queue': hasher.max_queue},
+        'seconds': round(elapsed, 3),
+        'successful_logins_per_second': round(statuses.get(302, 0) / elapsed, 1),
+        'status_codes': statuses,
+        'login_latency': percentiles(latencies),
+        'other_request_latency': percentiles(background),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
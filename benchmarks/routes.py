@@ -0,0 +1,273 @@
+"""Latency, SQL statements and peak memory of the main pages on a synthetic dataset.
+
+    python benchmarks/routes.py --users 100 --clients 100000 --invoices 1000000 --items 5 \\
+        --database-uri postgresql://localhost/invoice_bench --output bench.json
+    python benchmarks/routes.py --skip-seed --database-uri postgresql://localhost/invoice_bench \\
+        --baseline bench.json
+
+Seeds ``--users`` tenants sharing ``--clients`` clients and ``--invoices``
+invoices (``--items`` line items each on average) with a fixed random seed,
+so every run on the same arguments sees the same data. Then each route is
+requested ``--requests`` times through the Flask test client, as a random
+tenant each time. The JSON report has latency percentiles, SQL statements
+per request and the tracemalloc peak of a few extra requests per route.
+
+With ``--baseline`` the report is compared against an earlier one. The
+script exits 1 if a route's p95 grew by more than ``--max-regression`` or it
+now runs more statements per request.
+
+PDFs render in a separate process pool, so their memory isn't included.
+Seeding a large dataset into SQLite takes a while; seed once into a
+``--database-uri`` and rerun with ``--skip-seed``.
+"""
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from datetime import date, timedelta
+
+from common import StatementCounter, bench_app, percentiles
+
+CHUNK = 5000
+
+
+def seed(app, users, clients, invoices, items, rng):
+    """Insert the dataset with explicit ids, chunk by chunk, then build the derived tables."""
+    from sqlalchemy import insert, text
+
+    from app import db, rollup
+    from app.status import mark_overdue
+    from app.models import Client, Invoice, LineItem, User
+
+    clients_per_user = max(1, clients // users)
+    start = date.today() - timedelta(days=730)
+    with app.app_context():
+        db.session.execute(insert(User), [
+            {'id': u + 1, 'email': f'tenant{u}@bench.example', 'name': f'Tenant {u}',
+             'password_hash': '!', 'is_verified': True} for u in range(users)])
+        for first in range(0, clients_per_user * users, CHUNK):
+            db.session.execute(insert(Client), [
+                {'id': i + 1, 'user_id': i % users + 1, 'name': f'Client {i}', 'email': f'client{i}@bench.example',
+                 'company': f'Company {i % 997}', 'phone': f'555-{i:07d}'}
+                for i in range(first, min(first + CHUNK, clients_per_user * users))])
+            db.session.commit()
+
+        line_item_id = 0
+        for first in range(0, invoices, CHUNK):
+            invoice_rows, item_rows = [], []
+            for i in range(first, min(first + CHUNK, invoices)):
+                user = i % users
+                issued = start + timedelta(days=rng.randrange(730))
+                total = 0.0
+                for n in range(rng.randint(1, max(1, 2 * items - 1))):
+                    quantity, unit_price = rng.randint(1, 10), round(rng.uniform(5, 500), 2)
+                    line_item_id += 1
+                    item_rows.append({'id': line_item_id, 'invoice_id': i + 1, 'description': f'Item {n}',
+                                      'quantity': quantity, 'unit_price': unit_price, 'total': quantity * unit_price})
+                    total += quantity * unit_price
+                invoice_rows.append({
+                    'id': i + 1, 'user_id': user + 1,
+                    'client_id': rng.randrange(clients_per_user) * users + user + 1,
+                    'issue_date': issued, 'due_date': issued + timedelta(days=30),
+                    'status': 'paid' if rng.random() < 0.6 else 'unpaid', 'total_amount': round(total, 2)})
+            db.session.execute(insert(Invoice), invoice_rows)
+            db.session.execute(insert(LineItem), item_rows)
+            db.session.commit()
+            print(f'seeded {min(first + CHUNK, invoices)}/{invoices} invoices', file=sys.stderr)
+
+        if db.engine.dialect.name == 'postgresql':
+            for table in ('"user"', 'client', 'invoice', 'line_item'):
+                db.session.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), coalesce(max(id), 1)) FROM {table}"))
+            db.session.commit()
+        rollup.rebuild()
+        rollup.reconcile_clients()
+        mark_overdue()
+
+
+def sample_invoice_ids(app, per_user=200):
+    from sqlalchemy import select
+
+    from app import db
+    from app.models import Invoice, User
+
+    with app.app_context():
+        user_ids = db.session.scalars(select(User.id).where(User.email.like('tenant%@bench.example'))).all()
+        return {user_id: db.session.scalars(select(Invoice.id).where(Invoice.user_id == user_id)
+                                            .order_by(Invoice.id).limit(per_user)).all()
+                for user_id in user_ids}
+
+
+def route_cases():
+    """(name, endpoint, url arguments) for every page under test."""
+    return [
+        ('dashboard.index', 'dashboard.index', lambda ids, rng: {}),
+        ('dashboard.reports', 'dashboard.reports', lambda ids, rng: {}),
+        ('invoices.list_invoices', 'invoices.list_invoices', lambda ids, rng: {}),
+        ('invoices.list_invoices (overdue)', 'invoices.list_invoices', lambda ids, rng: {'status': 'overdue'}),
+        ('invoices.view_invoice', 'invoices.view_invoice', lambda ids, rng: {'invoice_id': rng.choice(ids)}),
+        ('invoices.download_pdf', 'invoices.download_pdf', lambda ids, rng: {'invoice_id': rng.choice(ids)}),
+        ('clients.list_clients', 'clients.list_clients', lambda ids, rng: {}),
+        ('clients.list_clients (search)', 'clients.list_clients',
+         lambda ids, rng: {'q': f'Client {rng.randrange(1000)}'}),
+        ('api.list_invoices', 'api.list_invoices', lambda ids, rng: {}),
+    ]
+
+
+class Driver:
+    """One logged-in test client per tenant; Flask-Login only needs the session key."""
+
+    def __init__(self, app, invoice_ids, rng):
+        self.app = app
+        self.invoice_ids = {user_id: ids for user_id, ids in invoice_ids.items() if ids}
+        self.rng = rng
+        self._clients = {}
+
+    def client(self, user_id):
+        client = self._clients.get(user_id)
+        if client is None:
+            client = self._clients[user_id] = self.app.test_client()
+            with client.session_transaction() as session:
+                session['_user_id'] = str(user_id)
+                session['_fresh'] = True
+        return client
+
+    def url(self, endpoint, args):
+        from flask import url_for
+
+        user_id = self.rng.choice(list(self.invoice_ids))
+        with self.app.test_request_context():
+            return user_id, url_for(endpoint, **args(self.invoice_ids[user_id], self.rng))
+
+    def get(self, user_id, url):
+        response = self.client(user_id).get(url)
+        response.get_data()  # drain streamed bodies inside the timing
+        return response.status_code
+
+
+def measure(app, driver, requests, warmup, memory_requests):
+    from app import db
+
+    with app.app_context():
+        engine = db.engine
+    results = {}
+    for name, endpoint, args in route_cases():
+        for _ in range(warmup):
+            driver.get(*driver.url(endpoint, args))
+
+        latencies, statements, statuses = [], [], Counter()
+        with StatementCounter(engine) as counter:
+            for _ in range(requests):
+                user_id, url = driver.url(endpoint, args)
+                before = sum(counter.statements.values())
+                started = time.perf_counter()
+                statuses[driver.get(user_id, url)] += 1
+                latencies.append(time.perf_counter() - started)
+                statements.append(sum(counter.statements.values()) - before)
+
+        tracemalloc.start()
+        for _ in range(memory_requests):
+            driver.get(*driver.url(endpoint, args))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        results[name] = {
+            'requests': requests,
+            'status_codes': {str(code): n for code, n in sorted(statuses.items())},
+            **percentiles(latencies),
+            'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2) if latencies else None,
+            'statements_per_request': round(sum(statements) / len(statements), 2) if statements else None,
+            'max_statements': max(statements, default=None),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+        print(f'{name}: p95 {results[name].get("p95_ms")} ms', file=sys.stderr)
+    return results
+
+
+def compare(routes, baseline, max_regression):
+    """Human-readable regressions of ``routes`` against a previous report's routes."""
+    regressions = []
+    for name, result in routes.items():
+        old = baseline.get('routes', {}).get(name)
+        if not old:
+            continue
+        if old.get('p95_ms') and result.get('p95_ms') and result['p95_ms'] > old['p95_ms'] * (1 + max_regression):
+            regressions.append(f'{name}: p95 {old["p95_ms"]} ms -> {result["p95_ms"]} ms')
+        if (old.get('statements_per_request') is not None
+                and result['statements_per_request'] > old['statements_per_request'] + 0.5):
+            regressions.append(f'{name}: statements/request {old["statements_per_request"]} -> '
+                               f'{result["statements_per_request"]}')
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--clients', type=int, default=2000)
+    parser.add_argument('--invoices', type=int, default=20000)
+    parser.add_argument('--items', type=int, default=3, help='average line items per invoice')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database-uri', default=None, help='default: a temporary SQLite file')
+    parser.add_argument('--skip-seed', action='store_true', help='reuse data seeded by an earlier run')
+    parser.add_argument('--requests', type=int, default=50, help='timed requests per route')
+    parser.add_argument('--warmup', type=int, default=3, help='untimed requests per route first')
+    parser.add_argument('--memory-requests', type=int, default=5, help='requests per route under tracemalloc')
+    parser.add_argument('--output', help='write the JSON report here as well as to stdout')
+    parser.add_argument('--baseline', help='earlier JSON report to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.25, help='allowed p95 growth, as a fraction')
+    args = parser.parse_args()
+
+    # The scheduler would otherwise run mark-overdue in the middle of a measurement.
+    app = bench_app(args.database_uri, OVERDUE_CHECK_INTERVAL=0)
+    seed_seconds = None
+    if not args.skip_seed:
+        started = time.perf_counter()
+        seed(app, args.users, args.clients, args.invoices, args.items, random.Random(args.seed))
+        seed_seconds = round(time.perf_counter() - started, 1)
+
+    driver = Driver(app, sample_invoice_ids(app), random.Random(args.seed))
+    routes = measure(app, driver, args.requests, args.warmup, args.memory_requests)
+
+    from app import db
+    with app.app_context():
+        dialect = db.engine.dialect.name
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'database': dialect,
+            'python': platform.python_version(),
+            'dataset': {'users': args.users, 'clients': args.clients, 'invoices': args.invoices,
+                        'items': args.items, 'seed': args.seed},
+            'seed_seconds': seed_seconds,
+            'requests_per_route': args.requests,
+        },
+        'routes': routes,
+    }
+    if args.baseline:
+        with open(args.baseline) as fh:
+            report['regressions'] = compare(routes, json.load(fh), args.max_regression)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            fh.write(output + '\n')
+    if report.get('regressions'):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
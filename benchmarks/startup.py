@@ -0,0 +1,89 @@
+"""How long a fresh worker takes to import the app, build it and serve a first request.
+
+    python benchmarks/startup.py --runs 10
+
+Every run is a new interpreter, as a freshly forked or spawned worker would
+be without preloading. The JSON report has the median and worst time of
+each phase, the time app/preload.py's warm_up takes (paid once by a
+preloading master instead) with the first request after it, and the slowest
+imports measured with -X importtime.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r'''
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app_ = app.create_app()
+created = time.perf_counter()
+result = {'import': imported - started, 'create_app': created - imported}
+if WARM_UP:
+    from app.preload import warm_up
+    warm_up(app_)
+    result['warm_up'] = time.perf_counter() - created
+    created = time.perf_counter()
+response = app_.test_client().get('/login')
+served = time.perf_counter()
+result.update(first_request=served - created, total=served - started, status=response.status_code)
+print(json.dumps(result))
+'''
+
+
+def probe(warm_up, env):
+    code = PROBE.replace('WARM_UP', repr(warm_up))
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, capture_output=True, text=True,
+                         check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def slowest_imports(env, count):
+    err = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app; app.create_app()'],
+                         cwd=ROOT, env=env, capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        # Only top-level and direct imports, otherwise parents and children crowd each other out
+        if len(name) - len(name.lstrip()) <= 3:
+            rows.append((int(cumulative), name.strip()))
+    return [{'module': name, 'ms': round(us / 1000, 1)} for us, name in sorted(rows, reverse=True)[:count]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top-imports', type=int, default=10)
+    parser.add_argument('--database-uri', default='sqlite://', help='default: in-memory SQLite')
+    args = parser.parse_args()
+
+    env = dict(os.environ, DATABASE_URI=args.database_uri)
+    env.setdefault('SECRET_KEY', 'startup-benchmark')
+    runs = [probe(warm_up=False, env=env) for _ in range(args.runs)]
+    warmed = probe(warm_up=True, env=env)
+
+    phases = {}
+    for phase in ('import', 'create_app', 'first_request', 'total'):
+        samples = [run[phase] for run in runs]
+        phases[phase] = {'median_ms': round(statistics.median(samples) * 1000, 1),
+                         'max_ms': round(max(samples) * 1000, 1)}
+    print(json.dumps({
+        'runs': args.runs,
+        'phases': phases,
+        'warm_up_ms': round(warmed['warm_up'] * 1000, 1),
+        'first_request_after_warm_up_ms': round(warmed['first_request'] * 1000, 1),
+        'first_request_status': runs[0]['status'],
+        'slowest_imports': slowest_imports(env, args.top_imports),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
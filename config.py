@@ -3,17 +3,70 @@ import os
 from dotenv import load_dotenv
 
 load_dotenv()
+
+
+def env_int(name, default=None):
+    """``int`` of environment variable ``name``, or ``default`` when it is unset or blank."""
+    value = os.getenv(name, '').strip()
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'{name} must be an integer, not {value!r}') from None
+
+
+def env_float(name, default=None):
+    """``float`` of environment variable ``name``, or ``default`` when it is unset or blank."""
+    value = os.getenv(name, '').strip()
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f'{name} must be a number, not {value!r}') from None
+
+
+def engine_options():
+    """SQLAlchemy pool settings from the DB_POOL_* variables that are set; SQLite keeps its own defaults."""
+    options = {}
+    for option, name in (('pool_size', 'DB_POOL_SIZE'), ('max_overflow', 'DB_MAX_OVERFLOW'),
+                         ('pool_timeout', 'DB_POOL_TIMEOUT'), ('pool_recycle', 'DB_POOL_RECYCLE')):
+        value = env_int(name)
+        if value is not None:
+            options[option] = value
+    if os.getenv('DB_POOL_PRE_PING', 'False') == 'True':
+        options['pool_pre_ping'] = True
+    return options
+
+
+def replica_binds():
+    """A 'replica_<n>' bind per comma-separated DATABASE_REPLICA_URIS entry (app/replicas.py)."""
+    uris = [uri.strip() for uri in os.getenv('DATABASE_REPLICA_URIS', '').split(',') if uri.strip()]
+    return {f'replica_{n}': uri for n, uri in enumerate(uris)}
+
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY')
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URI')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Pool size, overflow, timeout, recycle and pre-ping, for the primary and replicas alike:
+    # DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE (seconds), DB_POOL_PRE_PING=True
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options()
+
+    # Read replicas for @read_only views. An unreachable replica is skipped for
+    # REPLICA_RETRY_SECONDS; after a write the user reads from the primary for
+    # REPLICA_STICKY_SECONDS, which should cover the replication lag.
+    SQLALCHEMY_BINDS = replica_binds()
+    REPLICA_RETRY_SECONDS = env_float('REPLICA_RETRY_SECONDS', 30.0)
+    REPLICA_STICKY_SECONDS = env_float('REPLICA_STICKY_SECONDS', 5.0)
     IMAP_SERVER = os.getenv('IMAP_SERVER')
 
-    IMAP_PORT = int(os.getenv('IMAP_PORT'))
+    IMAP_PORT = env_int('IMAP_PORT', 993)
 
     MAIL_SERVER = os.getenv('MAIL_SERVER')
 
-    MAIL_PORT = int(os.getenv('MAIL_PORT'))
+    MAIL_PORT = env_int('MAIL_PORT', 465)  # SSL by default, see MAIL_USE_SSL
 
     MAIL_USERNAME = os.getenv('MAIL_USERNAME')
 
@@ -25,4 +78,92 @@ class Config:
 
     MAIL_ASCII_ATTACHMENTS = os.getenv('MAIL_ASCII_ATTACHMENTS') == 'True'
 
-    ADMIN_EMAIL = os.environ.get('ADMIN_EMAIL')
\ No newline at end of file
+    ADMIN_EMAIL = os.environ.get('ADMIN_EMAIL')
+
+    # Outbound mail queue (app/email.py)
+    MAIL_WORKERS = env_int('MAIL_WORKERS', 2)
+    MAIL_QUEUE_SIZE = env_int('MAIL_QUEUE_SIZE', 1000)
+    MAIL_BATCH_SIZE = env_int('MAIL_BATCH_SIZE', 20)
+    MAIL_MAX_RETRIES = env_int('MAIL_MAX_RETRIES', 3)
+    MAIL_RETRY_BACKOFF = env_float('MAIL_RETRY_BACKOFF', 1.0)
+    MAIL_ENQUEUE_TIMEOUT = env_float('MAIL_ENQUEUE_TIMEOUT', 2.0)
+
+    # Overdue reminders: messages per second (0 = unlimited) and how long
+    # before the same invoice may be reminded again
+    REMINDER_RATE_LIMIT = env_float('REMINDER_RATE_LIMIT', 5.0)
+    REMINDER_COOLDOWN_HOURS = env_float('REMINDER_COOLDOWN_HOURS', 72.0)
+
+    # Password hashing (app/passwords.py). The method is a full werkzeug spec,
+    # e.g. 'pbkdf2:sha256:1000000' or 'scrypt:32768:8:1'; stored hashes made
+    # with other parameters are upgraded on the user's next login.
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000000')
+    PASSWORD_SALT_LENGTH = env_int('PASSWORD_SALT_LENGTH', 16)
+    PASSWORD_HASH_WORKERS = env_int('PASSWORD_HASH_WORKERS', max(1, (os.cpu_count() or 2) // 2))
+    PASSWORD_HASH_MAX_QUEUE = env_int('PASSWORD_HASH_MAX_QUEUE', 16)
+    PASSWORD_HASH_TIMEOUT = env_float('PASSWORD_HASH_TIMEOUT', 10.0)
+
+    # Due dates are compared against "today" in this zone (app/status.py)
+    BUSINESS_TIMEZONE = os.getenv('BUSINESS_TIMEZONE', 'UTC')
+    # Seconds between in-process `mark-overdue` runs per web process; 0 turns the
+    # scheduler off (run `flask invoices mark-overdue` from cron instead)
+    OVERDUE_CHECK_INTERVAL = env_float('OVERDUE_CHECK_INTERVAL', 3600.0)
+
+    # /stats (app/metrics.py): every extension's counters as JSON to any
+    # logged-in user. They are process-wide, across tenants, so it's off by default.
+    STATS_ENABLED = os.getenv('STATS_ENABLED', 'False') == 'True'
+
+    # Instrumentation (app/instrumentation.py): Prometheus text on /metrics,
+    # served only when METRICS_TOKEN is set, to requests bearing that token. Requests slower than
+    # SLOW_REQUEST_MS are logged (0 disables), as are requests that run one
+    # statement more than N_PLUS_ONE_THRESHOLD times.
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+    SLOW_REQUEST_MS = env_float('SLOW_REQUEST_MS', 0.0)
+    N_PLUS_ONE_THRESHOLD = env_int('N_PLUS_ONE_THRESHOLD', 10)
+
+    # Pagination
+    INVOICES_PER_PAGE = env_int('INVOICES_PER_PAGE', 25)
+    MAX_PER_PAGE = env_int('MAX_PER_PAGE', 100)
+    CLIENTS_PER_PAGE = env_int('CLIENTS_PER_PAGE', 24)
+    # Stream the invoice and client lists while their rows load (app/rendering.py)
+    STREAM_TEMPLATES = os.getenv('STREAM_TEMPLATES', 'True') == 'True'
+
+    # On-the-fly response compression (app/compression.py). Turn it off when a
+    # proxy in front already compresses; bodies under COMPRESS_MIN_SIZE bytes
+    # are sent as they are.
+    COMPRESS_ENABLED = os.getenv('COMPRESS_ENABLED', 'True') == 'True'
+    COMPRESS_MIN_SIZE = env_int('COMPRESS_MIN_SIZE', 500)
+    COMPRESS_GZIP_LEVEL = env_int('COMPRESS_GZIP_LEVEL', 6)
+    COMPRESS_BROTLI_QUALITY = env_int('COMPRESS_BROTLI_QUALITY', 4)
+
+    # JSON API: most invoices accepted by one batch request
+    API_BATCH_MAX = env_int('API_BATCH_MAX', 500)
+
+    # Seconds the logged-in user's identity is cached between requests (0 disables)
+    USER_CACHE_TTL = env_float('USER_CACHE_TTL', 300.0)
+
+    # Seconds a user's dashboard counts are cached (0 disables)
+    DASHBOARD_STATS_TTL = env_float('DASHBOARD_STATS_TTL', 60.0)
+
+    # Rendered invoice pages kept per process, keyed by invoice version (0 disables)
+    INVOICE_FRAGMENT_CACHE_TTL = env_float('INVOICE_FRAGMENT_CACHE_TTL', 600.0)
+    INVOICE_FRAGMENT_CACHE_SIZE = env_int('INVOICE_FRAGMENT_CACHE_SIZE', 2000)
+
+    # Rendered invoice PDFs: 'memory' (per process), 'filesystem' (shared) or 'null'.
+    # Use 'filesystem' with more than one worker process, or polls of a 202 PDF
+    # job reaching another worker never see the result (gunicorn.conf.py does).
+    PDF_CACHE_BACKEND = os.getenv('PDF_CACHE_BACKEND', 'memory')
+    PDF_CACHE_DIR = os.getenv('PDF_CACHE_DIR')  # defaults to <instance>/pdf_cache
+    PDF_CACHE_MAX_BYTES = env_int('PDF_CACHE_MAX_BYTES', 64 * 1024 * 1024)
+
+    # WeasyPrint runs in a process pool; requests wait up to PDF_RENDER_WAIT
+    # seconds, then get a 202 with a job URL to poll.
+    PDF_RENDER_WORKERS = env_int('PDF_RENDER_WORKERS', min(4, os.cpu_count() or 1))
+    PDF_RENDER_MAX_QUEUE = env_int('PDF_RENDER_MAX_QUEUE', 32)
+    PDF_RENDER_WAIT = env_float('PDF_RENDER_WAIT', 10.0)
+    PDF_RENDER_START_METHOD = os.getenv('PDF_RENDER_START_METHOD')  # fork / spawn / forkserver
+    # Most invoices in one /invoices/export.pdf or .zip request (`flask invoices export-pdf` has no limit)
+    PDF_EXPORT_MAX = env_int('PDF_EXPORT_MAX', 500)
+    # Longest an export request waits for the combined PDF, or for the next
+    # file of a ZIP; past it the export gives up (a 503 for export.pdf).
+    PDF_EXPORT_TIMEOUT = env_float('PDF_EXPORT_TIMEOUT', 60.0)
@@ -0,0 +1,38 @@
+# gunicorn.conf.py
+#
+# Optional sample:  gunicorn -c gunicorn.conf.py run:app
+#
+# The app is imported once in the master and warmed up (app/preload.py) before
+# the workers fork, so each worker boots in milliseconds and shares the
+# warmed memory copy-on-write. Set GUNICORN_PRELOAD=0 to import the app in
+# every worker instead (needed for --reload).
+
+import os
+
+from dotenv import load_dotenv
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', (os.cpu_count() or 1) * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') == '1'
+
+# PDF render jobs live in the worker that started them; their results must
+# land in a cache every worker reads, or most polls of /invoices/pdf/jobs/
+# find nothing. .env is read first so a backend chosen there still wins.
+load_dotenv()
+if workers > 1:
+    os.environ.setdefault('PDF_CACHE_BACKEND', 'filesystem')
+
+
+def when_ready(server):
+    if preload_app:
+        from app.preload import warm_up
+        from run import app
+        warm_up(app)
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from app.preload import after_fork
+        from run import app
+        after_fork(app)
@@ -0,0 +1,57 @@
+"""client search index
+
+Revision ID: e1ed8f85db66
+Revises: 3cc5daa8ecb5
+Create Date: 2026-10-18 12:24:55.917103
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1ed8f85db66'
+down_revision = '3cc5daa8ecb5'
+branch_labels = None
+depends_on = None
+
+
+SEARCH_COLUMNS = ('name', 'company', 'email')
+
+SQLITE_TRIGGERS = {
+    'client_fts_ai': "AFTER INSERT ON client BEGIN "
+                     "INSERT INTO client_fts(rowid, name, company, email) "
+                     "VALUES (new.id, new.name, new.company, new.email); END",
+    'client_fts_ad': "AFTER DELETE ON client BEGIN "
+                     "INSERT INTO client_fts(client_fts, rowid, name, company, email) "
+                     "VALUES ('delete', old.id, old.name, old.company, old.email); END",
+    'client_fts_au': "AFTER UPDATE OF name, company, email ON client BEGIN "
+                     "INSERT INTO client_fts(client_fts, rowid, name, company, email) "
+                     "VALUES ('delete', old.id, old.name, old.company, old.email); "
+                     "INSERT INTO client_fts(rowid, name, company, email) "
+                     "VALUES (new.id, new.name, new.company, new.email); END",
+}
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for name in SEARCH_COLUMNS:
+            op.execute(f'CREATE INDEX IF NOT EXISTS ix_client_trgm_{name} ON client USING gin ({name} gin_trgm_ops)')
+    elif dialect == 'sqlite':
+        op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS client_fts USING fts5("
+                   "name, company, email, content='client', content_rowid='id', tokenize='trigram')")
+        for trigger, definition in SQLITE_TRIGGERS.items():
+            op.execute(f'CREATE TRIGGER IF NOT EXISTS {trigger} {definition}')
+        op.execute("INSERT INTO client_fts(client_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for name in SEARCH_COLUMNS:
+            op.execute(f'DROP INDEX IF EXISTS ix_client_trgm_{name}')
+    elif dialect == 'sqlite':
+        for trigger in SQLITE_TRIGGERS:
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS client_fts')
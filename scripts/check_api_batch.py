@@ -0,0 +1,134 @@
+"""Check POST /api/v1/invoices/batch against a throwaway SQLite database.
+
+Usage:
+    python scripts/check_api_batch.py
+
+Checked: a batch naming one invoice twice is rejected with a 422 and
+writes nothing (line items, totals, the monthly rollup and the client's
+balance are unchanged); a batch with distinct ids still applies; each
+result's ETag matches a GET of that invoice, and ETags change with every
+write even within one updated_at tick. Exits non-zero when a check fails.
+"""
+import os
+import sys
+import tempfile
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db, rollup  # noqa: E402
+from app.models import Client, Invoice, LineItem, MonthlyRevenue, User  # noqa: E402
+from config import Config  # noqa: E402
+
+
+def make_app():
+    fd, path = tempfile.mkstemp(suffix='.db', prefix='api-batch-')
+    os.close(fd)
+
+    class CheckConfig(Config):
+        SECRET_KEY = 'check-api-batch'
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+        SQLALCHEMY_BINDS = {}
+        OVERDUE_CHECK_INTERVAL = 0
+        WTF_CSRF_ENABLED = False
+        MAIL_SUPPRESS_SEND = True
+
+    return create_app(CheckConfig)
+
+
+def seed():
+    db.create_all()
+    user = User(email='api-batch@example.com', name='API Batch', password_hash='!', is_verified=True)
+    db.session.add(user)
+    db.session.flush()
+    client = Client(name='Batch Client', email='client@example.com', user_id=user.id)
+    db.session.add(client)
+    db.session.flush()
+    invoices = []
+    for day in (1, 2):
+        invoice = Invoice(user_id=user.id, client_id=client.id, issue_date=date(2030, 1, day),
+                          due_date=date(2030, 2, day), total_amount=100.0, status='unpaid')
+        invoice.line_items.append(LineItem(description='Work', quantity=1, unit_price=100.0, total=100.0))
+        db.session.add(invoice)
+        invoices.append(invoice)
+    db.session.commit()
+    rollup.rebuild()
+    rollup.reconcile_clients()
+    return user.id, client.id, [inv.id for inv in invoices]
+
+
+def state(client_id):
+    db.session.expire_all()
+    return {
+        'totals': sorted((inv.id, inv.total_amount, len(inv.line_items)) for inv in Invoice.query),
+        'revenue': sum(m.revenue for m in MonthlyRevenue.query),
+        'balance': db.session.get(Client, client_id).outstanding_balance,
+    }
+
+
+def lines(*prices):
+    return [{'description': f'Line {n}', 'quantity': 1, 'unit_price': price} for n, price in enumerate(prices)]
+
+
+def main():
+    failures = []
+
+    def check(name, ok, detail=''):
+        print(f'{"PASS" if ok else "FAIL"}  {name}' + (f'  ({detail})' if detail else ''))
+        if not ok:
+            failures.append(name)
+
+    app = make_app()
+    with app.app_context():
+        user_id, client_id, (first, second) = seed()
+        before = state(client_id)
+
+    http = app.test_client()
+    with http.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+    response = http.post('/api/v1/invoices/batch', json={'invoices': [
+        {'id': first, 'line_items': lines(100, 200)},
+        {'id': first, 'line_items': lines(300)},
+    ]})
+    errors = (response.get_json() or {}).get('errors', [])
+    check('a repeated id is rejected', response.status_code == 422 and [e['index'] for e in errors] == [1],
+          f'status {response.status_code}, {errors}')
+    with app.app_context():
+        after = state(client_id)
+    check('the rejected batch wrote nothing', after == before, f'{before} -> {after}')
+
+    response = http.post('/api/v1/invoices/batch', json={'invoices': [
+        {'id': first, 'line_items': lines(100, 200)},
+        {'id': second, 'line_items': lines(300)},
+    ]})
+    check('distinct ids are applied', response.status_code == 200, f'status {response.status_code}')
+    with app.app_context():
+        after = state(client_id)
+    check('totals, rollup and balance agree',
+          after['totals'] == [(first, 300.0, 2), (second, 300.0, 1)]
+          and after['revenue'] == 600.0 and after['balance'] == 600.0, f'{after}')
+
+    for result in response.get_json()['results']:
+        etag = http.get(f"/api/v1/invoices/{result['id']}").headers.get('ETag')
+        check(f"invoice {result['id']}'s batch ETag matches a GET", etag == result['etag'],
+              f"{result['etag']} vs {etag}")
+
+    # Two writes in the same instant (updated_at pinned) must still change the ETag.
+    etag = http.get(f'/api/v1/invoices/{first}').headers.get('ETag')
+    with app.app_context():
+        invoice = db.session.get(Invoice, first)
+        stamp = invoice.updated_at
+        invoice.due_date = date(2030, 3, 1)
+        db.session.commit()
+        db.session.execute(db.update(Invoice).where(Invoice.id == first).values(updated_at=stamp))
+        db.session.commit()
+    changed = http.get(f'/api/v1/invoices/{first}').headers.get('ETag')
+    check('a write with an unchanged updated_at still changes the ETag', changed != etag, f'{etag} vs {changed}')
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""Check read-replica routing (app/replicas.py) against two local databases.
+
+Usage:
+    python scripts/check_replicas.py [--primary URI --replica URI]
+
+Both databases get the same tables and seed data; after that the script
+only writes to the primary, so the replica behaves like one with unbounded
+replication lag. By default they are two fresh SQLite files. Pass two empty
+Postgres databases (not a real streaming pair) to run against Postgres.
+
+Checked: @read_only views read from the replica; a user who just wrote
+reads from the primary until REPLICA_STICKY_SECONDS pass, then from the
+replica again; an unreachable replica falls back to the primary. Exits
+non-zero when a check fails.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from app.models import Client, Invoice, LineItem, User  # noqa: E402
+from config import Config  # noqa: E402
+
+STICKY_SECONDS = 1.0
+
+
+def make_app(primary, replica):
+    class CheckConfig(Config):
+        SECRET_KEY = 'check-replicas'
+        SQLALCHEMY_DATABASE_URI = primary
+        SQLALCHEMY_BINDS = {'replica_0': replica}
+        REPLICA_STICKY_SECONDS = STICKY_SECONDS
+        REPLICA_RETRY_SECONDS = 60
+        OVERDUE_CHECK_INTERVAL = 0
+        WTF_CSRF_ENABLED = False
+        MAIL_SUPPRESS_SEND = True
+
+    return create_app(CheckConfig)
+
+
+def seed(engine):
+    db.metadatas[None].create_all(bind=engine)
+    with Session(engine) as session:
+        user = User(email='replica-check@example.com', name='Replica Check', password_hash='!', is_verified=True)
+        session.add(user)
+        session.flush()
+        client = Client(name='Lagging Client', email='client@example.com', user_id=user.id)
+        session.add(client)
+        session.flush()
+        for day in (1, 2, 3):
+            invoice = Invoice(user_id=user.id, client_id=client.id, issue_date=date(2030, 1, day),
+                              due_date=date(2030, 2, day), total_amount=10.0, status='unpaid')
+            invoice.line_items.append(LineItem(description='Work', quantity=1, unit_price=10.0, total=10.0))
+            session.add(invoice)
+        session.commit()
+        return user.id, invoice.id
+
+
+class Selects:
+    """SELECTs per engine while the block runs."""
+
+    def __init__(self, engines):
+        self.counts = Counter()
+        self._listeners = {name: (engine, self._counter(name)) for name, engine in engines.items()}
+
+    def _counter(self, name):
+        def count(conn, cursor, statement, *args):
+            if statement.lstrip().upper().startswith('SELECT'):
+                self.counts[name] += 1
+        return count
+
+    def __enter__(self):
+        for engine, listener in self._listeners.values():
+            event.listen(engine, 'before_cursor_execute', listener)
+        return self
+
+    def __exit__(self, *exc):
+        for engine, listener in self._listeners.values():
+            event.remove(engine, 'before_cursor_execute', listener)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--primary', help='default: a temporary SQLite file')
+    parser.add_argument('--replica', help='default: a temporary SQLite file')
+    args = parser.parse_args()
+    tmp = tempfile.mkdtemp(prefix='replicas-')
+    primary = args.primary or f'sqlite:///{os.path.join(tmp, "primary.db")}'
+    replica = args.replica or f'sqlite:///{os.path.join(tmp, "replica.db")}'
+
+    failures = []
+
+    def check(name, ok, detail=''):
+        print(f'{"PASS" if ok else "FAIL"}  {name}' + (f'  ({detail})' if detail else ''))
+        if not ok:
+            failures.append(name)
+
+    app = make_app(primary, replica)
+    with app.app_context():
+        engines = {'primary': db.engines[None], 'replica': db.engines['replica_0']}
+        user_id, invoice_id = seed(engines['primary'])
+        seed(engines['replica'])
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+    for url in ('/invoices/list', '/dashboard/', '/dashboard/reports'):
+        with Selects(engines) as selects:
+            response = client.get(url)
+        check(f'{url} reads from the replica', response.status_code == 200 and selects.counts['replica'] > 0,
+              f'status {response.status_code}, selects {dict(selects.counts)}')
+
+    response = client.post(f'/invoices/mark-paid/{invoice_id}')
+    check('mark-paid writes to the primary', response.status_code == 302, f'status {response.status_code}')
+
+    with Selects(engines) as selects:
+        page = client.get('/invoices/list').get_data(as_text=True)
+    check('the writer reads its own write from the primary',
+          selects.counts['replica'] == 0 and 'status-paid' in page, f'selects {dict(selects.counts)}')
+
+    time.sleep(STICKY_SECONDS + 0.1)
+    with Selects(engines) as selects:
+        page = client.get('/invoices/list').get_data(as_text=True)
+    check('after REPLICA_STICKY_SECONDS the replica (still unpaid) is used again',
+          selects.counts['replica'] > 0 and 'status-paid' not in page, f'selects {dict(selects.counts)}')
+
+    unreachable = f'sqlite:///{os.path.join(tmp, "missing", "replica.db")}'
+    app = make_app(primary, unreachable)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    response = client.get('/invoices/list')
+    stats = app.extensions['replicas'].stats()
+    check('an unreachable replica falls back to the primary',
+          response.status_code == 200 and stats['primary_fallbacks'] == 1 and stats['down'] == ['replica_0'],
+          f'status {response.status_code}, {stats}')
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""Print EXPLAIN plans for the queries behind each tenant-scoped route.
+
+Usage:
+    python scripts/explain_queries.py --user-id 1 [--no-seqscan] [--strict]
+
+Sequential scans over tenant tables are flagged. Postgres happily seq-scans
+tiny tables, so run it against a realistically sized database, or pass
+--no-seqscan to check that an index path exists at all. --strict exits
+non-zero when anything is flagged, which makes it usable in CI.
+"""
+import argparse
+import os
+import re
+import sys
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import case, extract, func, select, update  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from app.clients.search import search_criterion  # noqa: E402
+from app.models import Client, Invoice, LineItem  # noqa: E402
+
+TABLES = ('client', 'invoice', 'line_item')
+
+
+def route_queries(user_id, invoice_id):
+    today = date.today()
+    invoices = select(Invoice).where(Invoice.user_id == user_id)
+    page = [Invoice.due_date.desc(), Invoice.id.desc()]
+    return {
+        'invoices.list_invoices (all)': invoices.order_by(*page).limit(26),
+        'invoices.list_invoices (paid)': invoices.where(Invoice.status == 'paid').order_by(*page).limit(26),
+        'invoices.list_invoices (unpaid)': invoices.where(Invoice.status == 'unpaid').order_by(*page).limit(26),
+        'invoices.list_invoices (overdue)': invoices.where(Invoice.status == 'overdue').order_by(*page).limit(26),
+        'invoices.mark_overdue': update(Invoice).where(Invoice.status == 'unpaid', Invoice.due_date < today)
+            .values(status='overdue'),
+        'invoices.view_invoice': invoices.where(Invoice.id == invoice_id),
+        'invoices.view_invoice (line items)': select(LineItem).where(LineItem.invoice_id == invoice_id),
+        'clients.list_clients': select(Client).where(Client.user_id == user_id)
+            .order_by(Client.name, Client.id).limit(25),
+        'clients.list_clients (by balance, owing)': select(Client).where(
+            Client.user_id == user_id, Client.outstanding_balance > 0)
+            .order_by(Client.outstanding_balance.desc(), Client.id.desc()).limit(25),
+        'clients.search_clients': select(Client).where(Client.user_id == user_id, search_criterion('acme'))
+            .order_by(Client.name, Client.id).limit(11),
+        'dashboard.index (client count)': select(func.count(Client.id)).where(Client.user_id == user_id),
+        'dashboard.index (paid count)': select(func.count(Invoice.id)).where(
+            Invoice.user_id == user_id, Invoice.status == 'paid'),
+        'dashboard.index (recent)': invoices.order_by(Invoice.issue_date.desc()).limit(5),
+        'dashboard.reports (revenue this month)': select(func.sum(Invoice.total_amount)).where(
+            Invoice.user_id == user_id, Invoice.status == 'paid',
+            extract('month', Invoice.issue_date) == today.month,
+            extract('year', Invoice.issue_date) == today.year),
+        'dashboard.reports (top clients)': select(Client.name, func.sum(Invoice.total_amount))
+            .join(Invoice).where(Invoice.user_id == user_id, Invoice.status == 'paid')
+            .group_by(Client.name).order_by(func.sum(Invoice.total_amount).desc()).limit(3),
+        'dashboard.reports (status counts)': select(
+            func.sum(case((Invoice.status == 'paid', 1), else_=0)),
+            func.sum(case((Invoice.status == 'unpaid', 1), else_=0)),
+            func.sum(case((Invoice.status == 'overdue', 1), else_=0)),
+        ).where(Invoice.user_id == user_id),
+    }
+
+
+def explain(conn, stmt):
+    dialect = conn.dialect
+    compiled = stmt.compile(dialect=dialect)
+    params = compiled.construct_params()
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    prefix = 'EXPLAIN QUERY PLAN ' if dialect.name == 'sqlite' else 'EXPLAIN '
+    rows = conn.exec_driver_sql(prefix + compiled.string, params).fetchall()
+    if dialect.name == 'sqlite':
+        return [row[-1] for row in rows]
+    return [row[0] for row in rows]
+
+
+def is_seq_scan(line):
+    for table in TABLES:
+        if re.search(rf'\bSeq Scan on {table}\b', line):
+            return True
+        # SQLite reports "SCAN invoice" for a full scan and "SEARCH ... USING INDEX" otherwise.
+        if re.search(rf'^\s*SCAN {table}\b(?! USING (COVERING )?INDEX)', line):
+            return True
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--user-id', type=int, default=1)
+    parser.add_argument('--invoice-id', type=int, default=1)
+    parser.add_argument('--no-seqscan', action='store_true',
+                        help='SET enable_seqscan = off before explaining (Postgres only)')
+    parser.add_argument('--strict', action='store_true', help='exit 1 if any sequential scan is found')
+    args = parser.parse_args()
+
+    app = create_app()
+    flagged = []
+    with app.app_context(), db.engine.connect() as conn:
+        if args.no_seqscan and conn.dialect.name == 'postgresql':
+            conn.exec_driver_sql('SET enable_seqscan = off')
+        for name, stmt in route_queries(args.user_id, args.invoice_id).items():
+            plan = explain(conn, stmt)
+            print(f'== {name}')
+            for line in plan:
+                marker = '!!' if is_seq_scan(line) else '  '
+                print(f'{marker} {line}')
+                if marker == '!!':
+                    flagged.append(name)
+            print()
+
+    if flagged:
+        print('Sequential scans in: ' + ', '.join(sorted(set(flagged))))
+        if args.strict:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()